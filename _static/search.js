@@ -0,0 +1,139 @@
+/*
+ * Client-side search for the generated movie pages.
+ *
+ * Loads the prebuilt <User>-index.json (see search_index.py) on first use
+ * and filters it in the browser: every word typed must be a prefix of
+ * some word in the title; rating/year inputs narrow the result further.
+ */
+(function () {
+  "use strict";
+
+  var MAX_RESULTS = 50;
+
+  function ready(fn) {
+    if (document.readyState !== "loading") {
+      fn();
+    } else {
+      document.addEventListener("DOMContentLoaded", fn);
+    }
+  }
+
+  function tokenize(text) {
+    return text.toLowerCase().match(/[\p{L}\p{N}_]+/gu) || [];
+  }
+
+  // Rows whose titles contain a word starting with `prefix`.
+  function rowsForPrefix(index, prefix) {
+    var rows = new Set();
+    Object.keys(index.tokens).forEach(function (token) {
+      if (token.lastIndexOf(prefix, 0) === 0) {
+        index.tokens[token].forEach(function (row) {
+          rows.add(row);
+        });
+      }
+    });
+    return rows;
+  }
+
+  function search(index, query, minRating, startYear, endYear) {
+    var words = tokenize(query);
+    var candidates = null;
+
+    words.forEach(function (word) {
+      var rows = rowsForPrefix(index, word);
+      if (candidates === null) {
+        candidates = rows;
+      } else {
+        candidates = new Set(
+          Array.from(candidates).filter(function (row) {
+            return rows.has(row);
+          })
+        );
+      }
+    });
+
+    if (candidates === null) {
+      candidates = index.title.map(function (_, row) {
+        return row;
+      });
+    }
+
+    return Array.from(candidates).filter(function (row) {
+      if (minRating !== null && index.rating[row] < minRating) return false;
+      if (startYear !== null && index.year[row] < startYear) return false;
+      if (endYear !== null && index.year[row] > endYear) return false;
+      return true;
+    });
+  }
+
+  function numberOrNull(input) {
+    var value = parseFloat(input.value);
+    return isNaN(value) ? null : value;
+  }
+
+  function render(list, index, rows) {
+    list.textContent = "";
+    rows.slice(0, MAX_RESULTS).forEach(function (row) {
+      var item = document.createElement("li");
+      var link = document.createElement("a");
+      link.href = index.pages[index.page[row]];
+      link.textContent =
+        index.title[row] + " (" + index.year[row] + "): " +
+        index.rating[row].toFixed(1);
+      item.appendChild(link);
+      list.appendChild(item);
+    });
+    if (rows.length > MAX_RESULTS) {
+      var more = document.createElement("li");
+      more.textContent = "... " + (rows.length - MAX_RESULTS) + " more";
+      list.appendChild(more);
+    }
+  }
+
+  ready(function () {
+    var form = document.querySelector("form.movie-search");
+    if (!form || !window.fetch) return;
+
+    var list = form.querySelector(".search-results");
+    var index = null;
+    var loading = null;
+
+    function load() {
+      if (!loading) {
+        loading = fetch(form.dataset.index)
+          .then(function (resp) {
+            return resp.json();
+          })
+          .then(function (data) {
+            index = data;
+          });
+      }
+      return loading;
+    }
+
+    function update() {
+      load().then(function () {
+        var query = form.elements.q.value;
+        var minRating = numberOrNull(form.elements.min_rating);
+        var startYear = numberOrNull(form.elements.start_year);
+        var endYear = numberOrNull(form.elements.end_year);
+
+        if (!query.trim() && minRating === null &&
+            startYear === null && endYear === null) {
+          list.textContent = "";
+          return;
+        }
+        render(list, index, search(index, query, minRating, startYear,
+                                   endYear));
+      });
+    }
+
+    form.hidden = false;
+    form.addEventListener("focusin", load);
+    form.addEventListener("input", update);
+    form.addEventListener("submit", function (event) {
+      event.preventDefault();
+      update();
+    });
+  });
+})();
@@ -0,0 +1,341 @@
+"""
+Benchmark suite for storage, search, stats and site generation.
+
+Builds synthetic collections, times the hot paths of movies.py and writes
+the results as JSON so runs can be compared across commits. OMDb and
+restcountries are replaced by local fakes, so no network is used; with
+--omdb-fixtures the CLI add benchmark replays recorded OMDb answers
+instead (see omdb_client.py).
+
+Run:
+    python3 benchmark.py
+    python3 benchmark.py --sizes 1000,100000,1000000 --users 50 -o after.json
+    python3 benchmark.py --storage memory --compare before.json
+    python3 benchmark.py --omdb-fixtures data/omdb_fixtures.json.gz \
+        --omdb-latency recorded
+"""
+
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+from unittest import mock
+
+import movies as app
+import omdb_client
+from storage import get_storage
+
+WORDS = (
+    "alien amber angel atlas autumn blade blue broken castle city cold "
+    "crimson dark dawn desert dragon dream echo empire fallen fire forest "
+    "frozen ghost glass gold heart hidden house hunter iron island jungle "
+    "king last light lost moon night ocean orange paper queen rain red "
+    "river road secret shadow silent silver sky snow star stone storm sun "
+    "thunder tiger time twelve valley war water white wild wind winter wolf"
+).split()
+
+COUNTRIES = {
+    "United States": "US",
+    "United Kingdom": "GB",
+    "France": "FR",
+    "Germany": "DE",
+    "Japan": "JP",
+    "India": "IN",
+    "Italy": "IT",
+    "Brazil": "BR",
+}
+
+
+class _FakeResponse(io.BytesIO):
+    """Minimal stand-in for the object urlopen() returns."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def fake_urlopen(url, timeout=None):  # pylint: disable=unused-argument
+    """Serve canned OMDb / restcountries / poster answers offline."""
+    parsed = urllib.parse.urlparse(url)
+
+    if parsed.netloc == "img.example.invalid":
+        return _FakeResponse(b"\xff\xd8fake-jpeg" + url.encode("utf-8"))
+
+    if "omdbapi" in parsed.netloc:
+        query = urllib.parse.parse_qs(parsed.query)
+        title = query.get("t", ["Unknown"])[0]
+        rnd = random.Random(title)
+        payload = {
+            "Response": "True",
+            "Title": title.title(),
+            "Year": str(rnd.randint(1920, 2024)),
+            "imdbRating": f"{rnd.uniform(1, 10):.1f}",
+            "Poster": f"https://img.example.invalid/{rnd.getrandbits(32)}.jpg",
+            "imdbID": f"tt{rnd.randint(0, 9999999):07d}",
+            "Country": rnd.choice(list(COUNTRIES)),
+        }
+    elif "restcountries" in parsed.netloc:
+        name = urllib.parse.unquote(parsed.path.rsplit("/", 1)[-1])
+        payload = [{"cca2": COUNTRIES.get(name, "")}]
+    else:
+        raise ConnectionError(f"benchmark: unexpected URL {url}")
+
+    return _FakeResponse(json.dumps(payload).encode("utf-8"))
+
+
+def synthetic_movies(count, seed=0):
+    """Yield `count` (title, year, rating, poster, imdb_id, country) rows."""
+    rnd = random.Random(seed)
+    countries = list(COUNTRIES)
+    for i in range(count):
+        title = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(1, 3)))
+        yield (
+            f"{title.title()} {i}",
+            rnd.randint(1920, 2024),
+            round(rnd.uniform(1, 10), 1),
+            f"https://img.example.invalid/{i}.jpg",
+            f"tt{i:07d}",
+            rnd.choice(countries),
+        )
+
+
+@contextlib.contextmanager
+def scripted_input(*answers):
+    """Answer input() prompts from `answers` and swallow stdout."""
+    replies = iter(answers)
+    with mock.patch.object(builtins, "input", lambda _="": next(replies)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+
+
+def timed(func, repeat):
+    """Return the best wall time of `repeat` calls to func()."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def populate(backend, size, users):
+    """Create `users` users sharing `size` movies; return timing + ids."""
+    user_ids = [backend.create_user(f"bench_user_{n}") for n in range(users)]
+    start = time.perf_counter()
+    for i, row in enumerate(synthetic_movies(size)):
+        backend.add_movie(user_ids[i % users], *row)
+    return time.perf_counter() - start, user_ids
+
+
+def run_size(backend, size, users, repeat, omdb_titles=None):
+    """Run every benchmark for one collection size."""
+    results = []
+
+    def record(name, seconds, ops=1):
+        results.append({
+            "size": size,
+            "benchmark": name,
+            "seconds": round(seconds, 6),
+            "ops": ops,
+            "ops_per_sec": round(ops / seconds, 1) if seconds else None,
+        })
+        print(f"  {name:<28} {seconds * 1000:10.2f} ms")
+
+    elapsed, user_ids = populate(backend, size, users)
+    record("add_movie_bulk", elapsed, size)
+
+    uid = user_ids[0]
+
+    if omdb_titles:
+        cli_titles = omdb_titles
+        label = "add_movie_cli (replayed OMDb)"
+    else:
+        cli_titles = [f"omdb fake {size} {n}" for n in range(50)]
+        label = "add_movie_cli (fake OMDb)"
+
+    def add_via_omdb():
+        for title in cli_titles:
+            with scripted_input(title):
+                app.add_movie_cli(uid)
+
+    record(label, timed(add_via_omdb, 1), len(cli_titles))
+
+    record(
+        "list_movies",
+        timed(lambda: backend.list_movies(uid), repeat),
+    )
+    movies = backend.list_movies(uid)
+
+    queries = ["dark nite", "the silver wolf", "zzz", "ocean"]
+    record(
+        "custom_get_close_matches",
+        timed(
+            lambda: [
+                app.custom_get_close_matches(q, movies.keys())
+                for q in queries
+            ],
+            repeat,
+        ),
+        len(queries),
+    )
+
+    record(
+        "random_movie (filtered)",
+        timed(
+            lambda: backend.random_movie(
+                uid, min_rating=7.5, start_year=1990, end_year=1999,
+                weighted=True,
+            ),
+            repeat,
+        ),
+    )
+
+    def search():
+        with scripted_input("shadow"):
+            app.search_movie(movies)
+
+    record("search_movie", timed(search, repeat))
+
+    def stats():
+        with scripted_input():
+            app.stats(movies)
+
+    record("stats", timed(stats, repeat))
+
+    def filter_movies():
+        with scripted_input("7.5", "1990", "1999"):
+            app.filter_movies(movies)
+
+    record("filter_movies", timed(filter_movies, repeat))
+
+    def website():
+        with scripted_input():
+            app.generate_website(uid, "bench_user_0")
+
+    record("generate_website", timed(website, repeat))
+
+    return results
+
+
+def git_revision():
+    """Return the current git commit hash, or '' outside a checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(current, baseline_path):
+    """Print the speed ratio of each result against a previous run."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    previous = {
+        (r["size"], r["benchmark"]): r["seconds"] for r in baseline["results"]
+    }
+    print(f"\nCompared with {baseline_path} ({baseline['meta'].get('git')}):")
+    for r in current:
+        old = previous.get((r["size"], r["benchmark"]))
+        if not old or not r["seconds"]:
+            continue
+        ratio = old / r["seconds"]
+        print(f"  {r['size']:>8} {r['benchmark']:<28} x{ratio:6.2f}")
+
+
+def fresh_backend(name, workdir, size):
+    """Return an empty backend for one run."""
+    if name == "memory":
+        backend = get_storage("memory")
+        backend.reset()
+        return backend
+    db_path = os.path.join(workdir, f"bench_{size}.db")
+    return get_storage("sql", db_url=f"sqlite:///{db_path}")
+
+
+def main(argv=None):
+    """Parse arguments, run the suite and write the JSON report."""
+    parser = argparse.ArgumentParser(description="Movie App benchmarks")
+    parser.add_argument("--sizes", default="1000,10000")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--storage", choices=("sql", "memory"), default="sql")
+    parser.add_argument("-o", "--output", default="bench_output.json")
+    parser.add_argument("--compare", help="previous JSON report")
+    parser.add_argument("--omdb-fixtures",
+                        help="replay recorded OMDb answers from this archive")
+    parser.add_argument("--omdb-latency", default="0",
+                        type=app.omdb_latency_arg,
+                        help='replay delay in seconds or "recorded"')
+    args = parser.parse_args(argv)
+
+    omdb_titles = None
+    omdb_client.configure("live")
+    if args.omdb_fixtures:
+        omdb_client.configure("replay", args.omdb_fixtures, args.omdb_latency)
+        omdb_titles = [
+            q["t"] for q in omdb_client.recorded_queries() if "t" in q
+        ][:50]
+        if not omdb_titles:
+            parser.error(f"no recorded title lookups in {args.omdb_fixtures}")
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = []
+
+    with tempfile.TemporaryDirectory() as workdir, \
+            mock.patch("urllib.request.urlopen", fake_urlopen), \
+            mock.patch.object(app, "SITE_DIR", workdir):
+        for size in sizes:
+            print(f"\n{size} movies across {args.users} users "
+                  f"({args.storage}):")
+            app.storage = fresh_backend(args.storage, workdir, size)
+            results.extend(
+                run_size(app.storage, size, args.users, args.repeat,
+                         omdb_titles)
+            )
+            if hasattr(app.storage, "get_engine"):
+                app.storage.get_engine().dispose()
+
+    report = {
+        "meta": {
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "storage": args.storage,
+            "users": args.users,
+            "repeat": args.repeat,
+            "omdb": (
+                f"replay {args.omdb_fixtures} ({args.omdb_latency})"
+                if omdb_titles else "fake"
+            ),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
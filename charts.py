@@ -0,0 +1,161 @@
+"""
+Chart rendering for the CLI and the generated website.
+
+Charts are drawn with matplotlib's object-oriented Figure API on the Agg
+canvas (no pyplot global state) in a background process pool, so the menu
+never blocks on rendering. Each PNG is named after a hash of the data it
+shows; an unchanged collection maps to an existing file and is never
+rendered twice.
+
+Chart types:
+- "ratings":   histogram of ratings (1-10)
+- "years":     movies per release year
+- "countries": movies per country (top MAX_COUNTRIES)
+"""
+
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+import instrumentation
+
+CHART_TYPES = {
+    "ratings": "Movie Ratings Histogram",
+    "years": "Movies per Year",
+    "countries": "Movies per Country",
+}
+
+MAX_COUNTRIES = 10
+MAX_WORKERS = 2
+
+BASE_DIR = os.path.dirname(__file__)
+CHART_DIR = os.path.join(BASE_DIR, "_static", "charts")
+CHART_URL_PREFIX = "charts"
+
+_executor = None
+
+
+def chart_data(movies):
+    """
+    Aggregate movie dicts into plot-ready data for every chart type.
+
+    Returns {kind: [[label, count], ...]}, small enough to hash and to send
+    to a worker process.
+    """
+    ratings = Counter()
+    years = Counter()
+    countries = Counter()
+    for data in movies:
+        rating = data.get("rating") or 0.0
+        if 1 <= rating < 11:
+            ratings[int(rating)] += 1
+        if data.get("year"):
+            years[data["year"]] += 1
+        if data.get("country"):
+            countries[data["country"]] += 1
+
+    return {
+        "ratings": [[r, ratings.get(r, 0)] for r in range(1, 11)],
+        "years": sorted([y, n] for y, n in years.items()),
+        "countries": [[c, n] for c, n in countries.most_common(MAX_COUNTRIES)],
+    }
+
+
+def data_version(kind, data):
+    """Short hash identifying one chart's contents."""
+    raw = json.dumps([kind, data], separators=(",", ":")).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:12]
+
+
+def chart_filename(base, kind, data):
+    """Cache file name, e.g. John-ratings-1a2b3c4d5e6f.png."""
+    return f"{base}-{kind}-{data_version(kind, data)}.png"
+
+
+def render_chart(kind, data, path):
+    """
+    Draw one chart to `path` (runs inside a worker process).
+
+    Imports matplotlib lazily so the CLI starts without it.
+    """
+    # pylint: disable=import-outside-toplevel,import-error
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(6.4, 4.8))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    labels = [row[0] for row in data]
+    counts = [row[1] for row in data]
+
+    if kind == "ratings":
+        ax.bar(labels, counts, width=1.0, align="edge",
+               edgecolor="black", color="skyblue")
+        ax.set_xticks(range(1, 12))
+        ax.set_xlabel("Rating")
+    elif kind == "years":
+        ax.bar(labels, counts, width=1.0, color="skyblue")
+        ax.set_xlabel("Year")
+    elif kind == "countries":
+        ax.barh(labels[::-1], counts[::-1], color="skyblue")
+        ax.set_xlabel("Count")
+    else:
+        raise ValueError(f"Unknown chart type '{kind}'")
+
+    if kind != "countries":
+        ax.set_ylabel("Count")
+    ax.set_title(CHART_TYPES[kind])
+    fig.tight_layout()
+
+    tmp_path = f"{path}.{os.getpid()}.tmp.png"
+    fig.savefig(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _get_executor():
+    """Shared worker pool (processes, or threads where those are missing)."""
+    global _executor  # pylint: disable=global-statement
+    if _executor is None:
+        try:
+            _executor = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+        except (NotImplementedError, OSError):
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    return _executor
+
+
+def submit_chart(base, kind, data, chart_dir=None):
+    """
+    Render a chart in the background unless it is already cached.
+
+    Returns a Future resolving to the PNG path.
+    """
+    if kind not in CHART_TYPES:
+        raise ValueError(f"Unknown chart type '{kind}'")
+
+    chart_dir = chart_dir or CHART_DIR
+    os.makedirs(chart_dir, exist_ok=True)
+    path = os.path.join(chart_dir, chart_filename(base, kind, data))
+
+    if os.path.exists(path):
+        instrumentation.count("charts.cache_hits")
+        done = Future()
+        done.set_result(path)
+        return done
+
+    instrumentation.count("charts.rendered")
+    _remove_old_versions(chart_dir, base, kind, keep=path)
+    return _get_executor().submit(render_chart, kind, data, path)
+
+
+def _remove_old_versions(chart_dir, base, kind, keep):
+    """Delete cached PNGs of the same chart for older data."""
+    pattern = re.compile(re.escape(f"{base}-{kind}-") + r"[0-9a-f]{12}\.png")
+    for name in os.listdir(chart_dir):
+        path = os.path.join(chart_dir, name)
+        if pattern.fullmatch(name) and path != keep:
+            os.remove(path)
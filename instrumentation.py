@@ -0,0 +1,229 @@
+"""
+Lightweight timers, counters and profiling for the Movie App.
+
+- timer(name) / timed(name): record wall time of a block or function
+- count(name): bump a counter
+- instrument_module(module, names): time selected functions of a module
+- install_sqlalchemy_hooks(): per-statement SQL timing for every engine
+- start_profiler() / stop_profiler(): optional cProfile capture
+- report(): p50/p95 latencies and call counts as printable text
+
+Timers are always on; each call costs two perf_counter() reads and an
+append under a lock. Only the last MAX_SAMPLES samples per name are kept
+for percentiles, while call counts and totals cover the whole session.
+"""
+
+import contextlib
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+from collections import defaultdict, deque
+
+MAX_SAMPLES = 10_000
+
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+_calls = defaultdict(int)
+_totals = defaultdict(float)
+_counters = defaultdict(int)
+_profiler = None
+_hooks_installed = False
+
+
+def record(name, seconds):
+    """Record one duration (in seconds) under `name`."""
+    with _lock:
+        _samples[name].append(seconds)
+        _calls[name] += 1
+        _totals[name] += seconds
+
+
+def count(name, amount=1):
+    """Increment counter `name` by `amount`."""
+    with _lock:
+        _counters[name] += amount
+
+
+@contextlib.contextmanager
+def timer(name):
+    """Time the enclosed block under `name` (also when it raises)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator: time every call of the function under `name`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return func(*args, **kwargs)
+
+        wrapper.__instrumented__ = True
+        return wrapper
+
+    return decorator
+
+
+def instrument_module(module, names, prefix=None):
+    """
+    Replace module.<name> for each name with a timed wrapper.
+
+    Already wrapped functions are left alone, so this is safe to call
+    again after switching backends.
+    """
+    prefix = prefix or module.__name__.rsplit(".", 1)[-1]
+    for name in names:
+        func = getattr(module, name, None)
+        if func is None or getattr(func, "__instrumented__", False):
+            continue
+        setattr(module, name, timed(f"{prefix}.{name}")(func))
+
+
+def _statement_name(statement):
+    """Short label for a SQL statement, e.g. 'sql SELECT movies'."""
+    words = statement.split()
+    if not words:
+        return "sql"
+    verb = words[0].upper()
+    upper = [w.upper() for w in words]
+    table = ""
+    for keyword in ("FROM", "INTO", "UPDATE", "TABLE"):
+        if keyword in upper:
+            idx = upper.index(keyword) + 1
+            if keyword == "TABLE":
+                while idx < len(words) and upper[idx] in ("IF", "NOT",
+                                                          "EXISTS"):
+                    idx += 1
+            if idx < len(words):
+                table = words[idx].strip("(")
+            break
+    return f"sql {verb} {table}".rstrip()
+
+
+def install_sqlalchemy_hooks():
+    """Time every SQL statement executed by any SQLAlchemy engine."""
+    global _hooks_installed  # pylint: disable=global-statement
+    if _hooks_installed:
+        return
+
+    # pylint: disable=import-outside-toplevel
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        # pylint: disable=unused-argument,too-many-arguments
+        conn.info.setdefault("instr_start", []).append(time.perf_counter())
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        # pylint: disable=unused-argument,too-many-arguments
+        starts = conn.info.get("instr_start")
+        if starts:
+            record(_statement_name(statement),
+                   time.perf_counter() - starts.pop())
+
+    _hooks_installed = True
+
+
+def start_profiler():
+    """Start collecting a cProfile profile for the rest of the session."""
+    global _profiler  # pylint: disable=global-statement
+    if _profiler is None:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def stop_profiler(path=None, limit=25):
+    """
+    Stop cProfile and return the top `limit` functions as text.
+
+    If `path` is given, the raw stats are also dumped there
+    (open with `python -m pstats <path>` or snakeviz).
+    """
+    global _profiler  # pylint: disable=global-statement
+    if _profiler is None:
+        return ""
+
+    _profiler.disable()
+    if path:
+        _profiler.dump_stats(path)
+
+    out = io.StringIO()
+    pstats.Stats(_profiler, stream=out).sort_stats("cumulative").print_stats(
+        limit
+    )
+    _profiler = None
+    return out.getvalue()
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def snapshot():
+    """Return {name: {calls, total, p50, p95, max}} (seconds) plus counters."""
+    with _lock:
+        names = list(_calls)
+        samples = {name: sorted(_samples[name]) for name in names}
+        calls = dict(_calls)
+        totals = dict(_totals)
+        counters = dict(_counters)
+
+    timers = {
+        name: {
+            "calls": calls[name],
+            "total": totals[name],
+            "p50": percentile(samples[name], 50),
+            "p95": percentile(samples[name], 95),
+            "max": samples[name][-1] if samples[name] else 0.0,
+        }
+        for name in names
+    }
+    return {"timers": timers, "counters": counters}
+
+
+def report():
+    """Return a human readable timing report, slowest total first."""
+    data = snapshot()
+    if not data["timers"] and not data["counters"]:
+        return "No measurements recorded yet."
+
+    lines = [
+        f"{'name':<36} {'calls':>7} {'total ms':>10} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}"
+    ]
+    for name, t in sorted(data["timers"].items(),
+                          key=lambda item: item[1]["total"], reverse=True):
+        lines.append(
+            f"{name[:36]:<36} {t['calls']:>7} {t['total'] * 1000:>10.1f} "
+            f"{t['p50'] * 1000:>9.2f} {t['p95'] * 1000:>9.2f} "
+            f"{t['max'] * 1000:>9.2f}"
+        )
+
+    if data["counters"]:
+        lines.append("")
+        lines.append("Counters:")
+        for name, value in sorted(data["counters"].items()):
+            lines.append(f"  {name:<34} {value:>7}")
+    return "\n".join(lines)
+
+
+def reset():
+    """Forget all timers and counters."""
+    with _lock:
+        _samples.clear()
+        _calls.clear()
+        _totals.clear()
+        _counters.clear()
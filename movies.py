@@ -6,20 +6,62 @@ ANSI color codes may be treated as plain text if you use the Codio Run button.
 Run in Terminal for best output.
 """
 
+import argparse
 import html
 import json
 import os
-import random as rd
+import shutil
 import statistics as st
 import urllib.parse
 import urllib.request
-
-import matplotlib.pyplot as plt  # pylint: disable=import-error
-
-from storage import movie_storage_sql as storage
+from collections import Counter
+
+import charts
+import instrumentation
+import omdb_client
+import poster_cache
+import recommend
+import search_index
+from storage import BACKENDS, get_storage
+from storage.normalize import normalize_title
+
+# Active backend module; main() may swap it based on --storage/--db-url.
+storage = get_storage()
+
+# Built on first "Recommend movies", then caught up from the change feed.
+_recommender = None
+_recommender_seq = 0  # last change-feed seq applied to _recommender
+
+# (future, output path) of charts from "Create chart" not yet reported.
+_pending_charts = []
+
+# Storage functions timed by the instrumentation layer.
+STORAGE_API = (
+    "list_users",
+    "create_user",
+    "get_user_id",
+    "list_movies",
+    "add_movie",
+    "delete_movie",
+    "update_movie",
+    "random_movie",
+    "find_title",
+    "search_titles_prefix",
+    "list_title_keys",
+    "collection_version",
+    "changes_since",
+    "last_change_seq",
+    "changes_since_global",
+    "most_added_titles",
+    "top_rated_titles",
+    "country_counts",
+)
+
+# Templates live in _static/; generated pages are written to SITE_DIR.
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "_static")
+SITE_DIR = STATIC_DIR
 
 OMDB_API_KEY = "3bec4110"
-OMDB_BASE_URL = "http://www.omdbapi.com/"
 
 RESET = "\033[0m"
 RED = "\033[31m"
@@ -28,6 +70,7 @@ CYAN = "\033[36m"
 BOLD = "\033[1m"
 
 
+@instrumentation.timed("omdb.fetch_movie")
 def fetch_movie_from_omdb(title):
     """
     Fetch a movie from OMDb by title.
@@ -36,15 +79,20 @@ def fetch_movie_from_omdb(title):
     title, year, rating, poster, imdb_id, country, note
     """
     params = {"apikey": OMDB_API_KEY, "t": title}
-    url = f"{OMDB_BASE_URL}?{urllib.parse.urlencode(params)}"
 
     try:
-        with urllib.request.urlopen(url, timeout=10) as resp:
-            data = json.loads(resp.read().decode("utf-8"))
+        data = omdb_client.get_json(params)
+    except omdb_client.ReplayMissError as exc:
+        raise RuntimeError(
+            f'"{title}" is not in the OMDb fixture archive '
+            f"({omdb_client.FIXTURE_PATH})"
+        ) from exc
     except Exception as exc:
+        instrumentation.count("omdb.connection_errors")
         raise ConnectionError(f"OMDb connection failed: {exc}") from exc
 
     if data.get("Response") != "True":
+        instrumentation.count("omdb.not_found")
         raise RuntimeError(data.get("Error", "Movie not found"))
 
     api_title = (data.get("Title") or "").strip()
@@ -235,8 +283,7 @@ def add_movie_cli(active_user_id):
         print(f"{RED}OMDb error: {exc}{RESET}")
         return
 
-    movies = storage.list_movies(active_user_id)
-    if movie["title"] in movies:
+    if storage.find_title(active_user_id, movie["title"]) == movie["title"]:
         print(
             f'{RED}Error: "{movie["title"]}" already exists in your '
             f"collection.{RESET}"
@@ -254,28 +301,36 @@ def add_movie_cli(active_user_id):
             movie["country"],
         )
         print(f'✅ Movie "{movie["title"]}" added successfully.')
-    except storage.MovieAlreadyExistsError as exc:
+    except (
+        storage.MovieAlreadyExistsError,
+        storage.DatabaseBusyError,
+    ) as exc:
         print(f"{RED}{exc}{RESET}")
     except Exception as exc:
         print(f"{RED}Database error: {exc}{RESET}")
 
 
-def resolve_title(movies, user_input):
-    """Resolve stored title from user input (case-insensitive + suggestions)."""
-    if not movies:
-        return None
+def resolve_title(active_user_id, user_input):
+    """
+    Resolve stored title from user input (case/accent-insensitive).
 
-    key = user_input.strip().lower()
+    An exact match is an index lookup on the normalized title key; only
+    when it fails are the user's keys scanned for a unique substring match
+    or close-match suggestions. A unique prefix is not enough on its own:
+    "star" must stay ambiguous while "Lone Star" also contains it.
+    """
+    title = storage.find_title(active_user_id, user_input)
+    if title:
+        return title
 
-    title_map = {t.lower(): t for t in movies.keys()}
-    if key in title_map:
-        return title_map[key]
+    key = normalize_title(user_input)
+    title_keys = storage.list_title_keys(active_user_id)
 
-    substring_hits = [t for t in movies.keys() if key in t.lower()]
+    substring_hits = [t for t, t_key in title_keys if key in t_key]
     if len(substring_hits) == 1:
         return substring_hits[0]
 
-    similar = custom_get_close_matches(key, movies.keys(), cutoff=0.5)
+    similar = _close_matches(key, title_keys, cutoff=0.5)
     if similar:
         print(f'\nMovie "{user_input}" not found. Did you mean:')
         for suggestion in similar:
@@ -283,15 +338,19 @@ def resolve_title(movies, user_input):
     return None
 
 
+def has_movies(active_user_id):
+    """True if the user has at least one movie (a single index seek)."""
+    return bool(storage.search_titles_prefix(active_user_id, "", limit=1))
+
+
 def delete_movie(active_user_id):
     """Delete a movie from the active user's collection."""
-    movies = storage.list_movies(active_user_id)
-    if not movies:
+    if not has_movies(active_user_id):
         print(f"{RED}No movies in your collection.{RESET}")
         return
 
     typed = prompt_non_empty(f"{YELLOW}Enter movie title to delete: {RESET}")
-    title = resolve_title(movies, typed)
+    title = resolve_title(active_user_id, typed)
 
     if not title:
         print(f'{RED}Error: "{typed}" not found in your collection.{RESET}')
@@ -300,7 +359,7 @@ def delete_movie(active_user_id):
     try:
         storage.delete_movie(active_user_id, title)
         print(f'Deleted "{title}"')
-    except storage.MovieNotFoundError as exc:
+    except (storage.MovieNotFoundError, storage.DatabaseBusyError) as exc:
         print(f"{RED}{exc}{RESET}")
     except Exception as exc:
         print(f"{RED}Database error: {exc}{RESET}")
@@ -308,13 +367,12 @@ def delete_movie(active_user_id):
 
 def update_movie(active_user_id):
     """Update a movie's rating and note."""
-    movies = storage.list_movies(active_user_id)
-    if not movies:
+    if not has_movies(active_user_id):
         print(f"{RED}No movies in your collection.{RESET}")
         return
 
     typed = prompt_non_empty(f"{YELLOW}Enter movie name: {RESET}")
-    title = resolve_title(movies, typed)
+    title = resolve_title(active_user_id, typed)
 
     if not title:
         print(f'{RED}Error: "{typed}" not found in your collection.{RESET}')
@@ -330,7 +388,7 @@ def update_movie(active_user_id):
     try:
         storage.update_movie(active_user_id, title, rating=new_rating, note=note)
         print(f"Movie {title} successfully updated")
-    except storage.MovieNotFoundError as exc:
+    except (storage.MovieNotFoundError, storage.DatabaseBusyError) as exc:
         print(f"{RED}{exc}{RESET}")
     except Exception as exc:
         print(f"{RED}Database error: {exc}{RESET}")
@@ -363,48 +421,145 @@ def stats(movies):
     print(f"Worst movie(s): {', '.join(worst_movies)} ({worst_val:.1f})")
 
 
-def random_movie(movies):
-    """Print a random movie."""
-    if not movies:
-        print(f"{RED}No movies in database.{RESET}")
+def prompt_yes_no(prompt_text):
+    """Prompt until the user answers y or n; returns True for y."""
+    while True:
+        answer = input(prompt_text).strip().lower()
+        if answer in {"y", "n"}:
+            return answer == "y"
+        print(f"{RED}Invalid input. Please enter y or n.{RESET}")
+
+
+def random_movie(active_user_id):
+    """Print a random movie, optionally filtered and rating-weighted."""
+    filters = {}
+    weighted = False
+    if prompt_yes_no(f"{YELLOW}Filter or weight the pick? (y/n): {RESET}"):
+        filters["min_rating"] = prompt_optional_float(
+            f"{YELLOW}Enter minimum rating (blank = none): {RESET}",
+            1.0,
+            10.0,
+        )
+        filters["start_year"] = prompt_optional_int(
+            f"{YELLOW}Enter start year (blank = none): {RESET}",
+            1800,
+            2100,
+        )
+        filters["end_year"] = prompt_optional_int(
+            f"{YELLOW}Enter end year (blank = none): {RESET}",
+            1800,
+            2100,
+        )
+        country = input(
+            f"{YELLOW}Enter country (blank = any): {RESET}"
+        ).strip()
+        filters["country"] = country or None
+        weighted = prompt_yes_no(
+            f"{YELLOW}Favour higher rated movies? (y/n): {RESET}"
+        )
+
+    pick = storage.random_movie(active_user_id, weighted=weighted, **filters)
+    if pick is None:
+        print(f"{RED}No movies match your criteria.{RESET}")
         return
 
-    title, data = rd.choice(list(movies.items()))
+    title, data = pick
     print(f'Random choice: {title} ({data["year"]}): {data["rating"]:.1f}')
 
 
+def get_recommender():
+    """
+    Return the shared Recommender, building it from storage once.
+
+    The build precomputes every title's neighbour list. Later calls apply
+    only what changed since (storage.changes_since_global, one query for
+    all users) and re-score just the affected cached lists, so edits from
+    this session, imports and other processes are all picked up without
+    rebuilding the matrix or its neighbour lists.
+    """
+    global _recommender, _recommender_seq  # pylint: disable=global-statement
+    if _recommender is None:
+        # The seq is read first: changes that land during the scan are
+        # replayed on the next call, which is harmless (latest state wins).
+        _recommender_seq = storage.last_change_seq()
+        _recommender = recommend.Recommender.from_ratings(
+            storage.iter_ratings()
+        )
+        _recommender.precompute()
+        return _recommender
+
+    _recommender_seq, changes = storage.changes_since_global(_recommender_seq)
+    # Only the latest state of each (user, title) matters.
+    latest = {(user_id, title): data
+              for _, user_id, _, title, data in changes}
+    for (user_id, title), data in latest.items():
+        if data is None:
+            _recommender.remove_rating(user_id, title)
+        else:
+            _recommender.set_rating(user_id, title, data["rating"])
+    return _recommender
+
+
+def recommend_movies(active_user_id):
+    """Print titles other users rated that this user may like."""
+    recommendations = get_recommender().recommend(active_user_id)
+    if not recommendations:
+        print(
+            f"{RED}No recommendations yet. Rate more movies or wait for "
+            f"other users to add theirs.{RESET}"
+        )
+        return
+
+    print(f"\n{BOLD}Recommended for you:{RESET}\n")
+    for score, title in recommendations:
+        print(f"{title}: predicted {score:.1f}")
+
+
 def similarity_ratio(word_a, word_b):
     """Return similarity ratio between two strings (0..1)."""
-    word_a = word_a.lower()
-    word_b = word_b.lower()
+    return _similarity(word_a.lower(), word_b.lower())
 
-    matches = 0
-    a_used = [False] * len(word_a)
-    b_used = [False] * len(word_b)
 
-    for i, char_a in enumerate(word_a):
-        for j, char_b in enumerate(word_b):
-            if not a_used[i] and not b_used[j] and char_a == char_b:
-                matches += 1
-                a_used[i] = True
-                b_used[j] = True
-                break
+def _similarity(word_a, word_b):
+    """
+    similarity_ratio() for strings that are already lower-cased.
 
+    Each character of word_a pairs with one unused equal character of
+    word_b, so the number of matches is the size of the multiset
+    intersection of both strings' characters.
+    """
     if not word_a or not word_b:
         return 0
+    matches = sum((Counter(word_a) & Counter(word_b)).values())
     return (2 * matches) / (len(word_a) + len(word_b))
 
 
-def custom_get_close_matches(word, possibilities, max_results=3, cutoff=0.5):
-    """Return top-N close matches above cutoff."""
+def _close_matches(key, pairs, max_results=3, cutoff=0.5):
+    """
+    Top-N (title, key) pairs whose key is close to `key`.
+
+    `key` and the keys in `pairs` must already be normalized; returns
+    the titles.
+    """
     scored = []
-    for possibility in possibilities:
-        ratio = similarity_ratio(word, possibility)
+    for title, title_key in pairs:
+        ratio = _similarity(key, title_key)
         if ratio >= cutoff:
-            scored.append((ratio, possibility))
+            scored.append((ratio, title))
 
     scored.sort(reverse=True, key=lambda x: x[0])
-    return [possibility for _, possibility in scored[:max_results]]
+    return [title for _, title in scored[:max_results]]
+
+
+def custom_get_close_matches(word, possibilities, max_results=3, cutoff=0.5):
+    """Return top-N close matches above cutoff."""
+    word = word.lower()
+    return _close_matches(
+        word,
+        ((possibility, possibility.lower()) for possibility in possibilities),
+        max_results,
+        cutoff,
+    )
 
 
 def search_movie(movies):
@@ -523,24 +678,48 @@ def filter_movies(movies):
         print(f"{title} ({year}): {rating:.1f}")
 
 
-def create_histogram(movies):
-    """Create and save a histogram PNG of ratings."""
+def create_chart(movies, active_user_name):
+    """Render a chart PNG of the collection in the background."""
     if not movies:
         print(f"{RED}No movies in database.{RESET}")
         return
 
+    kinds = list(charts.CHART_TYPES)
+    for i, kind in enumerate(kinds, start=1):
+        print(f"{i}. {charts.CHART_TYPES[kind]}")
+    kind = kinds[prompt_int("Select chart: ", 1, len(kinds)) - 1]
+
     filename = prompt_non_empty(
         f"{YELLOW}Enter filename (without extension): {RESET}"
     )
+    output_path = f"{filename}.png"
 
-    ratings = [data["rating"] for data in movies.values()]
-    plt.hist(ratings, bins=range(1, 12), edgecolor="black", color="skyblue")
-    plt.title("Movie Ratings Histogram")
-    plt.xlabel("Rating")
-    plt.ylabel("Count")
-    plt.savefig(f"{filename}.png")
-    plt.close()
-    print(f"Histogram saved as {filename}.png")
+    data = charts.chart_data(movies.values())[kind]
+    future = charts.submit_chart(sanitize_filename(active_user_name), kind,
+                                 data, chart_dir=_chart_dir(SITE_DIR))
+    _pending_charts.append((future, output_path))
+    if not future.done():
+        print("Rendering in the background...")
+    report_charts()
+
+
+def report_charts(wait=False):
+    """
+    Copy finished background charts to their files and report them.
+
+    Runs on the main thread (before each menu, and with wait=True on exit)
+    so messages never land on top of a prompt.
+    """
+    for job in list(_pending_charts):
+        future, output_path = job
+        if not wait and not future.done():
+            continue
+        _pending_charts.remove(job)
+        try:
+            shutil.copyfile(future.result(), output_path)
+            print(f"Chart saved as {output_path}")
+        except Exception as exc:
+            print(f"{RED}Chart failed: {exc}{RESET}")
 
 
 def country_code_to_flag(code):
@@ -554,6 +733,7 @@ def country_code_to_flag(code):
     )
 
 
+@instrumentation.timed("restcountries.lookup")
 def country_name_to_cca2(country_name):
     """
     Call restcountries.com to get cca2.
@@ -571,67 +751,69 @@ def country_name_to_cca2(country_name):
         if isinstance(data, list) and data and "cca2" in data[0]:
             return (data[0]["cca2"] or "").upper()
     except Exception:
+        instrumentation.count("restcountries.errors")
         return ""
 
     return ""
 
 
-def generate_website(active_user_id, active_user_name):
-    """Generate _static/<User>.html from template for the active user."""
-    movies = storage.list_movies(active_user_id)
+SITE_PAGE_SIZE = 100
 
-    base_dir = os.path.dirname(__file__)
-    template_path = os.path.join(base_dir, "_static", "index_template.html")
-    static_dir = os.path.join(base_dir, "_static")
+# order_by -> label of the sort link; "title" pages keep <User>.html.
+SITE_SORTS = {
+    "title": "A-Z",
+    "rating": "By rating",
+    "year": "By year",
+}
 
-    filename = f"{sanitize_filename(active_user_name)}.html"
-    output_path = os.path.join(static_dir, filename)
 
-    with open(template_path, "r", encoding="utf-8") as f:
-        template = f.read()
+def movie_item_html(title, data, local_posters, flags):
+    """
+    Render one <li> of the movie grid.
 
-    items = []
-    for title, data in movies.items():
-        safe_title = html.escape(title)
-        year = data.get("year", "")
-        rating = data.get("rating", 0.0)
-        poster = (data.get("poster") or "").strip()
-        imdb_id = (data.get("imdb_id") or "").strip()
-        note = (data.get("note") or "").strip()
-        country = (data.get("country") or "").strip()
-
-        cca2 = country_name_to_cca2(country)
-        flag = country_code_to_flag(cca2)
-
-        if (
-            not poster
-            or poster == "N/A"
-            or not poster.startswith(("http://", "https://"))
-        ):
-            poster_html = '<div class="movie-poster"></div>'
-        else:
-            poster_html = (
-                f'<img class="movie-poster" '
-                f'src="{html.escape(poster)}" '
-                f'alt="{safe_title} poster" '
-                f'onerror="this.outerHTML='
-                f'\'<div class=&quot;movie-poster&quot;></div>\';" />'
-            )
+    `local_posters` maps remote poster URLs to mirrored copies; `flags`
+    memoizes country -> flag lookups for the current build.
+    """
+    safe_title = html.escape(title)
+    year = data.get("year", "")
+    rating = data.get("rating", 0.0)
+    poster = (data.get("poster") or "").strip()
+    imdb_id = (data.get("imdb_id") or "").strip()
+    note = (data.get("note") or "").strip()
+    country = (data.get("country") or "").strip()
+
+    if country not in flags:
+        flags[country] = country_code_to_flag(country_name_to_cca2(country))
+    flag = flags[country]
+
+    if not poster_cache.is_remote(poster):
+        poster_html = '<div class="movie-poster"></div>'
+    else:
+        poster_src = local_posters.get(poster, poster)
+        poster_html = (
+            f'<img class="movie-poster" '
+            f'src="{html.escape(poster_src)}" '
+            f'alt="{safe_title} poster" '
+            f'loading="lazy" '
+            f'width="{poster_cache.DISPLAY_WIDTH}" '
+            f'height="{poster_cache.DISPLAY_HEIGHT}" '
+            f'onerror="this.outerHTML='
+            f'\'<div class=&quot;movie-poster&quot;></div>\';" />'
+        )
 
-        if imdb_id:
-            imdb_url = (
-                "https://www.imdb.com/title/"
-                f"{html.escape(imdb_id)}/"
-            )
-            poster_html = (
-                f'<a href="{imdb_url}" target="_blank">{poster_html}</a>'
-            )
+    if imdb_id:
+        imdb_url = (
+            "https://www.imdb.com/title/"
+            f"{html.escape(imdb_id)}/"
+        )
+        poster_html = (
+            f'<a href="{imdb_url}" target="_blank">{poster_html}</a>'
+        )
 
-        note_attr = html.escape(note) if note else ""
-        flag_html = html.escape(flag)
+    note_attr = html.escape(note) if note else ""
+    flag_html = html.escape(flag)
 
-        items.append(
-            f"""<li>
+    return f"""<li>
     <div class="movie" title="{note_attr}">
         {poster_html}
         <div class="movie-title">{safe_title}
@@ -641,24 +823,398 @@ def generate_website(active_user_id, active_user_name):
         <div class="movie-rating">⭐ {rating:.1f}</div>
     </div>
 </li>"""
+
+
+def page_filename(base, order_by, page):
+    """
+    <base>.html, <base>.p2.html, <base>.by-rating.html, ...
+
+    sanitize_filename() never produces ".", so one user's extra pages can
+    not share a name with another user's base (e.g. "John-2").
+    """
+    stem = base if order_by == "title" else f"{base}.by-{order_by}"
+    return f"{stem}.html" if page == 1 else f"{stem}.p{page}.html"
+
+
+def _chunked(iterable, size):
+    """Yield lists of at most `size` items from `iterable`."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _sort_links_html(base, order_by, sorts):
+    """Links to the first page of every generated sort order."""
+    if len(sorts) < 2:
+        return ""
+    links = []
+    for key in sorts:
+        label = html.escape(SITE_SORTS[key])
+        if key == order_by:
+            links.append(f'<span class="current">{label}</span>')
+        else:
+            href = html.escape(page_filename(base, key, 1))
+            links.append(f'<a href="{href}">{label}</a>')
+    return f'<nav class="sort-links">{" | ".join(links)}</nav>'
+
+
+def _pagination_html(base, order_by, page, has_next):
+    """Prev/next links for one page (empty for a single page)."""
+    if page == 1 and not has_next:
+        return ""
+    parts = []
+    if page > 1:
+        href = html.escape(page_filename(base, order_by, page - 1))
+        parts.append(f'<a href="{href}" rel="prev">&larr; Prev</a>')
+    parts.append(f'<span class="current">Page {page}</span>')
+    if has_next:
+        href = html.escape(page_filename(base, order_by, page + 1))
+        parts.append(f'<a href="{href}" rel="next">Next &rarr;</a>')
+    return f'<nav class="pagination">{" ".join(parts)}</nav>'
+
+
+def _remove_stale_pages(static_dir, base, order_by, first_unused):
+    """Delete pages left over from an earlier, larger build."""
+    page = first_unused
+    while True:
+        path = os.path.join(static_dir, page_filename(base, order_by, page))
+        if not os.path.exists(path):
+            return
+        os.remove(path)
+        page += 1
+
+
+def _write_listing(static_dir, template, base, order_by, rows, page_size,
+                   sorts, flags, on_row=None, charts_html=""):
+    """
+    Write paginated pages for `rows` in one sort order.
+
+    Only the current and the next page are held in memory; the next page
+    is read ahead so the current one knows whether to link to it.
+    `on_row(title, data, page_file)` is called for every movie written and
+    `charts_html` is shown on the first page only.
+    Returns the number of pages written.
+    """
+    head, tail = template.split("__TEMPLATE_MOVIE_GRID__", 1)
+    head = head.replace(
+        "__TEMPLATE_SORT_LINKS__", _sort_links_html(base, order_by, sorts)
+    )
+
+    pages = _chunked(rows, page_size)
+    current = next(pages, [])
+    page = 1
+    while True:
+        following = next(pages, None)
+        local_posters = poster_cache.mirror_posters(
+            ((data.get("poster") or "").strip() for _, data in current),
+            os.path.join(static_dir, poster_cache.POSTER_URL_PREFIX),
         )
 
-    movie_grid_html = "\n".join(items)
+        filename = page_filename(base, order_by, page)
+        path = os.path.join(static_dir, filename)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(head.replace(
+                "__TEMPLATE_CHARTS__", charts_html if page == 1 else ""
+            ))
+            for title, data in current:
+                f.write(movie_item_html(title, data, local_posters, flags))
+                f.write("\n")
+                if on_row:
+                    on_row(title, data, filename)
+            f.write(tail.replace(
+                "__TEMPLATE_PAGINATION__",
+                _pagination_html(base, order_by, page, following is not None),
+            ))
+
+        if following is None:
+            break
+        current = following
+        page += 1
+
+    _remove_stale_pages(static_dir, base, order_by, page + 1)
+    return page
 
-    html_out = template.replace(
+
+def _chart_dir(static_dir):
+    """Chart cache that pages in `static_dir` link to."""
+    return os.path.join(static_dir, charts.CHART_URL_PREFIX)
+
+
+def _submit_site_charts(active_user_id, base, static_dir):
+    """
+    Start rendering every chart type for the site in the background.
+
+    Returns (futures, HTML with the <img> tags). File names depend only on
+    the data, so the HTML can be written before rendering has finished.
+    """
+    data = charts.chart_data(
+        movie for _, movie in storage.iter_movies(active_user_id)
+    )
+    if not any(count for _, count in data["ratings"]):
+        return [], ""
+
+    futures = []
+    images = []
+    for kind, label in charts.CHART_TYPES.items():
+        if not data[kind]:
+            continue
+        futures.append(charts.submit_chart(
+            base, kind, data[kind], chart_dir=_chart_dir(static_dir)
+        ))
+        src = f"{charts.CHART_URL_PREFIX}/" + charts.chart_filename(
+            base, kind, data[kind]
+        )
+        images.append(
+            f'<img src="{html.escape(src)}" alt="{html.escape(label)}" '
+            f'loading="lazy" width="640" height="480" />'
+        )
+    return futures, f'<div class="movie-charts">{"".join(images)}</div>'
+
+
+@instrumentation.timed("site.generate_website")
+def generate_website(active_user_id, active_user_name,
+                     page_size=SITE_PAGE_SIZE, sorts=tuple(SITE_SORTS)):
+    """
+    Generate _static/<User>.html (+ further pages) for the active user.
+
+    Movies are streamed from storage and written `page_size` per page
+    with prev/next links. Every order in `sorts` other than "title" gets
+    its own page set, e.g. _static/<User>.by-rating.html.
+
+    A search index (_static/<User>-index.json) is built from the first
+    sort order and only rewritten when the collection changed.
+    """
+    template_path = os.path.join(STATIC_DIR, "index_template.html")
+    static_dir = SITE_DIR
+
+    base = sanitize_filename(active_user_name)
+
+    with open(template_path, "r", encoding="utf-8") as f:
+        template = f.read()
+    template = template.replace(
         "__TEMPLATE_TITLE__",
-        f"{active_user_name}'s Movies",
+        html.escape(f"{active_user_name}'s Movies"),
+    )
+    template = template.replace(
+        "__TEMPLATE_SEARCH_INDEX__",
+        html.escape(search_index.index_filename(base)),
+    )
+
+    chart_futures, charts_html = _submit_site_charts(
+        active_user_id, base, static_dir
+    )
+
+    flags = {}
+    index = search_index.SearchIndexBuilder()
+    for order_by in sorts:
+        first = order_by == sorts[0]
+        rows = storage.iter_movies(active_user_id, order_by=order_by)
+        pages = _write_listing(
+            static_dir, template, base, order_by, rows, page_size, sorts,
+            flags,
+            on_row=index.add if first else None,
+            charts_html=charts_html if first else "",
+        )
+        instrumentation.count("site.pages_written", pages)
+
+    for future in chart_futures:
+        try:
+            future.result()
+        except Exception as exc:
+            print(f"{RED}Chart failed: {exc}{RESET}")
+
+    if index.write(static_dir, base):
+        instrumentation.count("site.search_index_written")
+
+    generate_leaderboard_page()
+
+    path = os.path.join(static_dir, page_filename(base, sorts[0], 1))
+    print(f"Website was generated successfully: {path}")
+
+
+LEADERBOARD_SIZE = 10
+# Titles need this many adds before they enter the top-rated list.
+LEADERBOARD_MIN_ADDS = 2
+# Contains ".", which sanitize_filename() never produces, so no user's
+# page (e.g. a user named "leaderboard") can share the name.
+LEADERBOARD_PAGE = "community.leaderboard.html"
+
+
+def leaderboard():
+    """Print community-wide aggregates across all users."""
+    most_added = storage.most_added_titles(LEADERBOARD_SIZE)
+    if not most_added:
+        print(f"{RED}No movies in database.{RESET}")
+        return
+
+    print(f"\n{BOLD}Most added titles:{RESET}")
+    for title, adds, avg_rating in most_added:
+        print(f"{title}: {adds} users, average {avg_rating:.1f}")
+
+    print(
+        f"\n{BOLD}Top rated titles "
+        f"(at least {LEADERBOARD_MIN_ADDS} users):{RESET}"
+    )
+    top_rated = storage.top_rated_titles(
+        LEADERBOARD_SIZE, LEADERBOARD_MIN_ADDS
     )
-    html_out = html_out.replace("__TEMPLATE_MOVIE_GRID__", movie_grid_html)
+    if not top_rated:
+        print("No title has enough ratings yet.")
+    for title, adds, avg_rating in top_rated:
+        print(f"{title}: {avg_rating:.1f} ({adds} users)")
+
+    print(f"\n{BOLD}Movies per country:{RESET}")
+    for country, total in storage.country_counts(LEADERBOARD_SIZE):
+        print(f"{country}: {total}")
+
+
+def _table_html(caption, headers, rows):
+    """Render a small HTML table; every cell is escaped."""
+    head = "".join(f"<th>{html.escape(h)}</th>" for h in headers)
+    body = "\n".join(
+        "<tr>" + "".join(f"<td>{html.escape(str(c))}</td>" for c in row)
+        + "</tr>"
+        for row in rows
+    )
+    return (
+        f"<table>\n<caption>{html.escape(caption)}</caption>\n"
+        f"<tr>{head}</tr>\n{body}\n</table>"
+    )
+
+
+@instrumentation.timed("site.generate_leaderboard")
+def generate_leaderboard_page():
+    """Generate LEADERBOARD_PAGE with community-wide aggregates."""
+    static_dir = SITE_DIR
+    template_path = os.path.join(STATIC_DIR, "leaderboard_template.html")
 
-    with open(output_path, "w", encoding="utf-8") as f:
+    with open(template_path, "r", encoding="utf-8") as f:
+        template = f.read()
+
+    tables = [
+        _table_html(
+            "Most added titles",
+            ("Title", "Users", "Average rating"),
+            (
+                (title, adds, f"{avg:.1f}")
+                for title, adds, avg in storage.most_added_titles(
+                    LEADERBOARD_SIZE
+                )
+            ),
+        ),
+        _table_html(
+            f"Top rated (at least {LEADERBOARD_MIN_ADDS} users)",
+            ("Title", "Average rating", "Users"),
+            (
+                (title, f"{avg:.1f}", adds)
+                for title, adds, avg in storage.top_rated_titles(
+                    LEADERBOARD_SIZE, LEADERBOARD_MIN_ADDS
+                )
+            ),
+        ),
+        _table_html(
+            "Movies per country",
+            ("Country", "Movies"),
+            storage.country_counts(),
+        ),
+    ]
+
+    html_out = template.replace("__TEMPLATE_TITLE__", "Community Leaderboard")
+    html_out = html_out.replace("__TEMPLATE_TABLES__", "\n".join(tables))
+
+    with open(os.path.join(static_dir, LEADERBOARD_PAGE), "w",
+              encoding="utf-8") as f:
         f.write(html_out)
 
-    print(f"Website was generated successfully: _static/{filename}")
+
+def performance_report():
+    """Print timings and counters collected so far in this session."""
+    print(f"\n{BOLD}--- Performance report ---{RESET}")
+    print(instrumentation.report())
+
+
+def omdb_latency_arg(value):
+    """argparse type for --omdb-latency."""
+    try:
+        return omdb_client.parse_latency(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from exc
+
+
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Movie App (CLI)")
+    parser.add_argument(
+        "--storage",
+        choices=sorted(BACKENDS),
+        help="storage backend (default: env MOVIE_APP_STORAGE or sql)",
+    )
+    parser.add_argument(
+        "--db-url",
+        help="SQLAlchemy URL for the sql backend "
+        "(default: env MOVIE_APP_DB_URL or data/movies.db)",
+    )
+    parser.add_argument(
+        "--omdb-mode",
+        choices=omdb_client.MODES,
+        help="live OMDb, record answers to the fixture archive, or replay "
+        "them offline (default: env MOVIE_APP_OMDB_MODE or live)",
+    )
+    parser.add_argument(
+        "--omdb-fixtures",
+        help="OMDb fixture archive (default: env MOVIE_APP_OMDB_FIXTURES "
+        "or data/omdb_fixtures.json.gz)",
+    )
+    parser.add_argument(
+        "--omdb-latency",
+        type=omdb_latency_arg,
+        help='replay delay in seconds, or "recorded" '
+        "(default: env MOVIE_APP_OMDB_LATENCY or 0)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="capture a cProfile profile and print timings on exit",
+    )
+    parser.add_argument(
+        "--profile-out",
+        default="movies.prof",
+        help="where --profile dumps raw cProfile stats",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Menu-driven movies database."""
+    global storage  # pylint: disable=global-statement
+
+    args = parse_args(argv)
+    if args.storage or args.db_url:
+        storage = get_storage(args.storage, db_url=args.db_url)
+    omdb_client.configure(args.omdb_mode, args.omdb_fixtures,
+                          args.omdb_latency)
+
+    instrumentation.instrument_module(storage, STORAGE_API, prefix="storage")
+    instrumentation.install_sqlalchemy_hooks()
+    if args.profile:
+        instrumentation.start_profiler()
+
+    try:
+        run_menu()
+    finally:
+        if args.profile:
+            performance_report()
+            print(instrumentation.stop_profiler(args.profile_out))
+            print(f"Raw profile written to {args.profile_out}")
 
 
-def main():
-    """Menu-driven movies database - SQL storage."""
+def run_menu():
+    """Run the interactive menu loop until the user exits."""
     active_user_id, active_user_name = select_user()
     menu = {
         0: "Exit",
@@ -670,11 +1226,14 @@ def main():
         6: "Random movie",
         7: "Search movie",
         8: "Movies sorted by rating",
-        9: "Create Rating Histogram",
+        9: "Create chart",
         10: "Movies sorted by year",
         11: "Filter movies",
         12: "Generate website",
         13: "Switch user",
+        14: "Performance report",
+        15: "Recommend movies",
+        16: "Community leaderboard",
     }
 
     actions = {
@@ -683,17 +1242,23 @@ def main():
         3: lambda: delete_movie(active_user_id),
         4: lambda: update_movie(active_user_id),
         5: lambda: stats(storage.list_movies(active_user_id)),
-        6: lambda: random_movie(storage.list_movies(active_user_id)),
+        6: lambda: random_movie(active_user_id),
         7: lambda: search_movie(storage.list_movies(active_user_id)),
         8: lambda: movies_sorted(storage.list_movies(active_user_id)),
-        9: lambda: create_histogram(storage.list_movies(active_user_id)),
+        9: lambda: create_chart(
+            storage.list_movies(active_user_id), active_user_name
+        ),
         10: lambda: movies_sorted_by_year(storage.list_movies(active_user_id)),
         11: lambda: filter_movies(storage.list_movies(active_user_id)),
         12: lambda: generate_website(active_user_id, active_user_name),
         13: None,
+        14: performance_report,
+        15: lambda: recommend_movies(active_user_id),
+        16: leaderboard,
     }
 
     while True:
+        report_charts()
         banner = (
             f"\n{BOLD}{CYAN}********** My Movies Database **********"
             f"{RESET}\n"
@@ -703,12 +1268,13 @@ def main():
             print(f"{BOLD}{CYAN}{i}. {operation}{RESET}")
 
         try:
-            choice = int(input(f"{YELLOW}\nEnter choice (0-13): {RESET}"))
+            choice = int(input(f"{YELLOW}\nEnter choice (0-16): {RESET}"))
         except ValueError:
-            print(f"{RED}Invalid input.{RESET} Try again (0-13)")
+            print(f"{RED}Invalid input.{RESET} Try again (0-16)")
             continue
 
         if choice == 0:
+            report_charts(wait=True)
             print("Bye!")
             break
 
@@ -718,7 +1284,7 @@ def main():
 
         action = actions.get(choice)
         if action is None:
-            print(f"{RED}Invalid input.{RESET} Try again (0-13)")
+            print(f"{RED}Invalid input.{RESET} Try again (0-16)")
             continue
 
         action()
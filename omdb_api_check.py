@@ -1,20 +1,37 @@
-"""Quick OMDb API connectivity check."""
-import requests
+"""
+Quick OMDb API connectivity check.
+
+Run:
+    python3 omdb_api_check.py                   # live API
+    python3 omdb_api_check.py --mode record     # live, and save the answer
+    python3 omdb_api_check.py --mode replay     # offline, from the fixtures
+"""
+import argparse
+
+import omdb_client
 
 API_KEY = "3bec4110"
 
 
-def main():
+def main(argv=None):
     """Call OMDb and print a small success/failure report."""
-    url = "http://www.omdbapi.com/"
-    params = {"apikey": API_KEY, "t": "Titanic"}
+    parser = argparse.ArgumentParser(description="OMDb API check")
+    parser.add_argument("--mode", choices=omdb_client.MODES)
+    parser.add_argument("--fixtures", help="fixture archive path")
+    parser.add_argument("--title", default="Titanic")
+    args = parser.parse_args(argv)
+    omdb_client.configure(args.mode, args.fixtures)
 
-    r = requests.get(url, params=params, timeout=10)
-    r.raise_for_status()
-    data = r.json()
+    params = {"apikey": API_KEY, "t": args.title}
+    try:
+        data = omdb_client.get_json(params, timeout=10)
+    except omdb_client.ReplayMissError:
+        print(f"❌ '{args.title}' was never recorded in "
+              f"{omdb_client.FIXTURE_PATH}.")
+        return
 
     if data.get("Response") == "True":
-        print("✅ API access works.")
+        print(f"✅ API access works ({omdb_client.MODE}).")
         print(f"Title: {data.get('Title')}")
         print(f"Year: {data.get('Year')}")
         print(f"IMDb rating: {data.get('imdbRating')}")
@@ -0,0 +1,193 @@
+"""
+OMDb transport with record/replay support.
+
+Modes (MOVIE_APP_OMDB_MODE or --omdb-mode):
+- "live":   query www.omdbapi.com (default)
+- "record": query the API and store every answer in the fixture archive
+- "replay": answer from the archive only; no network is touched
+
+The archive (MOVIE_APP_OMDB_FIXTURES, default data/omdb_fixtures.json.gz)
+is gzip-compressed JSON:
+
+    {"version": 1, "responses": {"t=Titanic": {"ms": 182.4, "data": {...}}}}
+
+Keys are the sorted query parameters without the API key, so recordings
+can be shared without leaking it. Replayed answers are delayed by
+MOVIE_APP_OMDB_LATENCY seconds (default 0), or by the time the live call
+took when it is set to "recorded".
+
+Recordings are kept in memory and written every SAVE_EVERY new answers
+and at interpreter exit (flush()), not after each request.
+"""
+
+import atexit
+import gzip
+import json
+import os
+import time
+import urllib.parse
+import urllib.request
+
+import instrumentation
+
+MODES = ("live", "record", "replay")
+BASE_URL = "http://www.omdbapi.com/"
+TIMEOUT = 10
+FIXTURE_VERSION = 1
+SAVE_EVERY = 50
+
+BASE_DIR = os.path.dirname(__file__)
+FIXTURE_PATH = os.environ.get(
+    "MOVIE_APP_OMDB_FIXTURES",
+    os.path.join(BASE_DIR, "data", "omdb_fixtures.json.gz"),
+)
+MODE = os.environ.get("MOVIE_APP_OMDB_MODE", "live")
+LATENCY = os.environ.get("MOVIE_APP_OMDB_LATENCY", "0")
+
+# Loaded lazily by _responses(); {key: {"ms": float, "data": dict}}
+_fixtures = None
+# Answers recorded since the archive was last written.
+_unsaved = 0
+
+
+class ReplayMissError(LookupError):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+def parse_latency(value):
+    """Return "recorded" or the latency in seconds; ValueError otherwise."""
+    if value == "recorded":
+        return value
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        seconds = -1.0
+    if not seconds >= 0:
+        raise ValueError(
+            f'latency must be seconds >= 0 or "recorded", not {value!r}'
+        )
+    return seconds
+
+
+def configure(mode=None, fixture_path=None, latency=None):
+    """
+    Switch mode, archive or replay latency at runtime.
+
+    `latency` is seconds (float) or "recorded". Arguments left as None
+    keep their current value.
+    """
+    # pylint: disable=global-statement
+    global MODE, FIXTURE_PATH, LATENCY, _fixtures
+
+    if mode is not None:
+        if mode not in MODES:
+            raise ValueError(
+                f"Unknown OMDb mode '{mode}' (choose from {', '.join(MODES)})."
+            )
+        MODE = mode
+    if fixture_path is not None and fixture_path != FIXTURE_PATH:
+        flush()
+        FIXTURE_PATH = fixture_path
+        _fixtures = None
+    if latency is not None:
+        LATENCY = str(parse_latency(latency))
+
+
+def fixture_key(params):
+    """Archive key for a query: sorted parameters without the API key."""
+    return urllib.parse.urlencode(
+        sorted((k, v) for k, v in params.items() if k != "apikey")
+    )
+
+
+def _responses():
+    """Recorded responses, loaded from FIXTURE_PATH on first use."""
+    global _fixtures  # pylint: disable=global-statement
+    if _fixtures is None:
+        try:
+            with gzip.open(FIXTURE_PATH, "rt", encoding="utf-8") as f:
+                archive = json.load(f)
+        except FileNotFoundError:
+            archive = {}
+        if archive and archive.get("version") != FIXTURE_VERSION:
+            raise ValueError(
+                f"{FIXTURE_PATH}: unsupported fixture version "
+                f"{archive.get('version')!r}"
+            )
+        _fixtures = archive.get("responses", {})
+    return _fixtures
+
+
+def save_fixtures():
+    """Write the recorded responses to FIXTURE_PATH (atomically)."""
+    global _unsaved  # pylint: disable=global-statement
+    os.makedirs(os.path.dirname(os.path.abspath(FIXTURE_PATH)), exist_ok=True)
+    archive = {"version": FIXTURE_VERSION, "responses": _responses()}
+    tmp_path = f"{FIXTURE_PATH}.{os.getpid()}.tmp"
+    # mtime=0 keeps the archive byte-identical for identical recordings.
+    with open(tmp_path, "wb") as raw, \
+            gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+        f.write(json.dumps(archive, ensure_ascii=False, sort_keys=True,
+                           separators=(",", ":")).encode("utf-8"))
+    os.replace(tmp_path, FIXTURE_PATH)
+    _unsaved = 0
+
+
+@atexit.register
+def flush():
+    """Write the archive if answers were recorded since the last save."""
+    if _unsaved:
+        save_fixtures()
+
+
+def recorded_queries():
+    """Return the parameter dicts of every recorded request."""
+    return [dict(urllib.parse.parse_qsl(key)) for key in _responses()]
+
+
+def _replay_delay(entry):
+    """Seconds to wait before serving a replayed response."""
+    if LATENCY == "recorded":
+        return entry.get("ms", 0.0) / 1000
+    return float(LATENCY or 0)
+
+
+def _fetch(params, timeout):
+    """Query the live API; returns (decoded JSON, milliseconds)."""
+    url = f"{BASE_URL}?{urllib.parse.urlencode(params)}"
+    start = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        data = json.loads(resp.read().decode("utf-8"))
+    return data, (time.perf_counter() - start) * 1000
+
+
+def get_json(params, timeout=TIMEOUT):
+    """
+    Return OMDb's decoded JSON answer for the query `params`.
+
+    Raises ReplayMissError in replay mode when the query was not recorded;
+    network and decoding errors propagate unchanged.
+    """
+    global _unsaved  # pylint: disable=global-statement
+    if MODE == "replay":
+        entry = _responses().get(fixture_key(params))
+        if entry is None:
+            instrumentation.count("omdb.replay_misses")
+            raise ReplayMissError(
+                f"No recorded OMDb response for {fixture_key(params)!r} "
+                f"in {FIXTURE_PATH}"
+            )
+        instrumentation.count("omdb.replayed")
+        delay = _replay_delay(entry)
+        if delay > 0:
+            time.sleep(delay)
+        return entry["data"]
+
+    data, ms = _fetch(params, timeout)
+    if MODE == "record":
+        _responses()[fixture_key(params)] = {"ms": round(ms, 1), "data": data}
+        _unsaved += 1
+        if _unsaved >= SAVE_EVERY:
+            save_fixtures()
+        instrumentation.count("omdb.recorded")
+    return data
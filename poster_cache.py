@@ -0,0 +1,146 @@
+"""
+Local poster mirror for the generated website.
+
+Posters are downloaded once, concurrently, and stored under
+_static/posters/<sha1 of url>.jpg, so identical URLs share one file and
+later site builds reuse it without touching the network. Images are
+shrunk to thumbnails with Pillow (listed in requirements.txt); without it
+the original bytes are stored as-is.
+
+A failed download leaves a <sha1 of url>.jpg.failed marker, so broken URLs
+are not retried on every build, only once the marker is older than
+RETRY_FAILED seconds.
+"""
+
+import hashlib
+import io
+import os
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+
+try:
+    from PIL import Image  # pylint: disable=import-error
+except ImportError:  # Pillow is optional
+    Image = None
+
+BASE_DIR = os.path.dirname(__file__)
+POSTER_DIR = os.path.join(BASE_DIR, "_static", "posters")
+POSTER_URL_PREFIX = "posters"
+
+# Size the posters are shown at (matches .movie-poster in style.css).
+DISPLAY_WIDTH = 128
+DISPLAY_HEIGHT = 193
+# Thumbnails are stored at 2x display size for high-DPI screens.
+THUMB_SIZE = (DISPLAY_WIDTH * 2, DISPLAY_HEIGHT * 2)
+
+MAX_WORKERS = 8
+TIMEOUT = 10
+# Seconds before a failed URL is tried again.
+RETRY_FAILED = 24 * 60 * 60
+
+
+def is_remote(url):
+    """True for http(s) poster URLs that can be mirrored."""
+    return bool(url) and url.startswith(("http://", "https://"))
+
+
+def poster_filename(url):
+    """Return the cache file name for a poster URL."""
+    return hashlib.sha1(url.encode("utf-8")).hexdigest() + ".jpg"
+
+
+def _failed_recently(path):
+    """True if the download for `path` failed less than RETRY_FAILED ago."""
+    try:
+        age = time.time() - os.path.getmtime(f"{path}.failed")
+    except OSError:
+        return False
+    return age < RETRY_FAILED
+
+
+def _mark_failed(path):
+    """Leave the negative-cache marker for `path`."""
+    with open(f"{path}.failed", "w", encoding="utf-8"):
+        pass
+
+
+def _thumbnail(raw):
+    """Return JPEG thumbnail bytes, or the original bytes without Pillow."""
+    if Image is None:
+        return raw
+    try:
+        with Image.open(io.BytesIO(raw)) as img:
+            img = img.convert("RGB")
+            img.thumbnail(THUMB_SIZE)
+            out = io.BytesIO()
+            img.save(out, format="JPEG", quality=85, optimize=True)
+            return out.getvalue()
+    except OSError:
+        # Not an image Pillow understands; keep the bytes unchanged.
+        return raw
+
+
+@instrumentation.timed("posters.download")
+def _download(url, path):
+    """Fetch one poster into `path`. Returns True on success."""
+    try:
+        with urllib.request.urlopen(url, timeout=TIMEOUT) as resp:
+            raw = resp.read()
+    except Exception:
+        raw = b""
+
+    if not raw:
+        instrumentation.count("posters.errors")
+        _mark_failed(path)
+        return False
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_thumbnail(raw))
+    os.replace(tmp_path, path)
+    try:
+        os.remove(f"{path}.failed")
+    except FileNotFoundError:
+        pass
+    return True
+
+
+def mirror_posters(urls, poster_dir=None, max_workers=MAX_WORKERS):
+    """
+    Make sure every remote URL in `urls` has a local copy.
+
+    `poster_dir` (default POSTER_DIR) must be the POSTER_URL_PREFIX folder
+    next to the pages that link to the posters. Returns {url: relative src
+    for the HTML page} for the posters that are available locally; failed
+    downloads are left out and not retried for RETRY_FAILED seconds.
+    """
+    poster_dir = poster_dir or POSTER_DIR
+    os.makedirs(poster_dir, exist_ok=True)
+
+    local = {}
+    missing = {}
+    for url in set(u for u in urls if is_remote(u)):
+        name = poster_filename(url)
+        path = os.path.join(poster_dir, name)
+        if os.path.exists(path):
+            local[url] = f"{POSTER_URL_PREFIX}/{name}"
+            instrumentation.count("posters.cache_hits")
+        elif _failed_recently(path):
+            instrumentation.count("posters.known_failures")
+        else:
+            missing[url] = (name, path)
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = pool.map(
+                lambda item: (item[0], _download(item[0], item[1][1])),
+                missing.items(),
+            )
+            for url, ok in results:
+                if ok:
+                    local[url] = f"{POSTER_URL_PREFIX}/{missing[url][0]}"
+
+    return local
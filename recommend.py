@@ -0,0 +1,218 @@
+"""
+Item-item collaborative filtering over all users' ratings.
+
+The user x title rating matrix is kept sparse in both directions
+(title -> {user: rating} and user -> {title: rating}). Similarity is the
+cosine of two titles' rating vectors, computed only over users who rated
+both, and damped when fewer than SIGNIFICANCE users rated both. For every
+title the TOP_K most similar titles are cached; after a rating changes
+only the affected lists are touched, so recommendations stay cheap
+without rebuilding the matrix.
+
+Prediction for a title t the user has not rated:
+    score(t) = (sum(sim(i, t) * r_i) + SHRINKAGE * mean)
+               / (sum(|sim(i, t)|) + SHRINKAGE)
+over the user's rated titles i that list t as a neighbour, where mean is
+the user's average rating.
+"""
+
+import heapq
+import math
+
+import instrumentation
+
+TOP_K = 20
+MIN_SIMILARITY = 0.0
+# Similarities from fewer common raters than this are scaled down.
+SIGNIFICANCE = 5
+# Pulls predictions backed by little similarity towards the user's mean.
+SHRINKAGE = 1.0
+
+
+class Recommender:
+    """Sparse rating matrix with cached item neighbour lists."""
+
+    def __init__(self, top_k=TOP_K):
+        self.top_k = top_k
+        self.by_title = {}   # title -> {user_id: rating}
+        self.by_user = {}    # user_id -> {title: rating}
+        self._norm2 = {}     # title -> sum of squared ratings
+        self._neighbors = {}  # title -> [(similarity, other_title)], desc
+
+    @classmethod
+    def from_ratings(cls, ratings, top_k=TOP_K):
+        """Build from an iterable of (user_id, title, rating)."""
+        rec = cls(top_k)
+        with instrumentation.timer("recommend.build_matrix"):
+            for user_id, title, rating in ratings:
+                rec._set(user_id, title, float(rating))
+        return rec
+
+    # -- matrix maintenance -------------------------------------------------
+
+    def _set(self, user_id, title, rating):
+        """Store one rating and keep the norm in sync."""
+        users = self.by_title.setdefault(title, {})
+        old = users.get(user_id)
+        if old is not None:
+            self._norm2[title] -= old * old
+        users[user_id] = rating
+        self.by_user.setdefault(user_id, {})[title] = rating
+        self._norm2[title] = self._norm2.get(title, 0.0) + rating * rating
+
+    def _unset(self, user_id, title):
+        """Remove one rating (no-op if missing)."""
+        users = self.by_title.get(title, {})
+        old = users.pop(user_id, None)
+        if old is None:
+            return
+        self._norm2[title] -= old * old
+        self.by_user.get(user_id, {}).pop(title, None)
+        if not users:
+            del self.by_title[title]
+            del self._norm2[title]
+            self._neighbors.pop(title, None)
+
+    def set_rating(self, user_id, title, rating):
+        """Add or change a rating and refresh the affected neighbour lists."""
+        self._set(user_id, title, float(rating))
+        self._refresh(title)
+
+    def remove_rating(self, user_id, title):
+        """Drop a rating and refresh the affected neighbour lists."""
+        affected = self._co_rated(title)
+        self._unset(user_id, title)
+        self._refresh(title, affected)
+
+    def _refresh(self, title, affected=None):
+        """
+        Update cached lists after `title`'s vector changed.
+
+        The title's own list is recomputed on next use. Every other cached
+        list that could contain it gets just that one entry re-scored, so a
+        change usually costs O(co-rated titles) instead of a full rebuild.
+        Only a full list whose entry for the title got worse is rebuilt, as
+        a title outside its top_k may now rank higher.
+        """
+        self._neighbors.pop(title, None)
+        if affected is None:
+            affected = self._co_rated(title)
+
+        for other in affected:
+            neigh = self._neighbors.get(other)
+            if neigh is None:
+                continue
+            old = next((n[0] for n in neigh if n[1] == title), None)
+            sim = (
+                self.similarity(other, title)
+                if title in self.by_title else 0.0
+            )
+            if old is not None and sim < old and len(neigh) >= self.top_k:
+                del self._neighbors[other]
+                self.neighbors(other)
+                continue
+            neigh = [n for n in neigh if n[1] != title]
+            if sim > MIN_SIMILARITY:
+                neigh.append((sim, title))
+                neigh.sort(reverse=True)
+                del neigh[self.top_k:]
+            self._neighbors[other] = neigh
+
+    # -- similarity ---------------------------------------------------------
+
+    def _co_rated(self, title):
+        """Titles sharing at least one rater with `title`."""
+        others = set()
+        for user_id in self.by_title.get(title, {}):
+            others.update(self.by_user[user_id])
+        others.discard(title)
+        return others
+
+    def similarity(self, title_a, title_b):
+        """Cosine similarity of two titles over their common raters."""
+        a = self.by_title.get(title_a, {})
+        b = self.by_title.get(title_b, {})
+        if len(a) > len(b):
+            a, b = b, a
+        common = [r * b[u] for u, r in a.items() if u in b]
+        if not common:
+            return 0.0
+        return self._cosine(title_a, title_b, sum(common), len(common))
+
+    def _cosine(self, title_a, title_b, dot, common):
+        """
+        Damped cosine from a precomputed dot product.
+
+        Titles rated only 0.0 (OMDb "N/A") have a zero norm and are not
+        similar to anything.
+        """
+        norms = self._norm2[title_a] * self._norm2[title_b]
+        if not dot or norms <= 0:
+            return 0.0
+        cosine = dot / math.sqrt(norms)
+        return cosine * min(common, SIGNIFICANCE) / SIGNIFICANCE
+
+    def neighbors(self, title):
+        """Cached top-k [(similarity, title)] for `title`, best first."""
+        cached = self._neighbors.get(title)
+        if cached is not None:
+            instrumentation.count("recommend.neighbor_cache_hits")
+            return cached
+
+        with instrumentation.timer("recommend.compute_neighbors"):
+            # Sparse dot products with every co-rated title in one pass.
+            dots = {}
+            counts = {}
+            for user_id, rating in self.by_title.get(title, {}).items():
+                for other, other_rating in self.by_user[user_id].items():
+                    if other != title:
+                        dots[other] = (
+                            dots.get(other, 0.0) + rating * other_rating
+                        )
+                        counts[other] = counts.get(other, 0) + 1
+
+            scored = (
+                (self._cosine(title, other, dot, counts[other]), other)
+                for other, dot in dots.items()
+                if dot
+            )
+            neigh = heapq.nlargest(
+                self.top_k,
+                (s for s in scored if s[0] > MIN_SIMILARITY),
+            )
+
+        self._neighbors[title] = neigh
+        return neigh
+
+    @instrumentation.timed("recommend.precompute")
+    def precompute(self):
+        """Fill the neighbour cache for every title."""
+        for title in self.by_title:
+            self.neighbors(title)
+
+    # -- recommendations ----------------------------------------------------
+
+    @instrumentation.timed("recommend.for_user")
+    def recommend(self, user_id, limit=10):
+        """Return [(predicted_rating, title)] the user has not rated yet."""
+        rated = self.by_user.get(user_id, {})
+        if not rated:
+            return []
+        mean = sum(rated.values()) / len(rated)
+        weighted = {}
+        weights = {}
+        for title, rating in rated.items():
+            for sim, other in self.neighbors(title):
+                if other in rated:
+                    continue
+                weighted[other] = weighted.get(other, 0.0) + sim * rating
+                weights[other] = weights.get(other, 0.0) + abs(sim)
+
+        predictions = (
+            (
+                (weighted[t] + SHRINKAGE * mean) / (weights[t] + SHRINKAGE),
+                t,
+            )
+            for t in weighted
+        )
+        return heapq.nlargest(limit, predictions)
@@ -0,0 +1,119 @@
+"""
+Prebuilt client-side search index for the generated website.
+
+The index is a compact, column-oriented JSON file next to the pages:
+
+    {
+      "version": 1,
+      "fingerprint": "<sha1 of the indexed rows>",
+      "pages": ["John.html", "John.p2.html"],
+      "title": [...], "year": [...], "rating": [...], "page": [...],
+      "tokens": {"dark": [0, 7], "knight": [0], ...}
+    }
+
+Row i of the column lists is one movie; "page" indexes into "pages".
+"tokens" maps each lower-cased word of a title to the rows containing it.
+_static/search.js loads it and filters in the browser. The file is only
+rewritten when the fingerprint of the collection changes.
+"""
+
+import hashlib
+import json
+import os
+import re
+
+INDEX_VERSION = 1
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_HEADER_RE = re.compile(r'^\{"version":(\d+),"fingerprint":"([0-9a-f]+)"')
+
+
+def tokenize(title):
+    """Split a title into lower-case word tokens."""
+    return _TOKEN_RE.findall(title.casefold())
+
+
+def index_filename(base):
+    """Index file name for a user's site, e.g. John-index.json."""
+    return f"{base}-index.json"
+
+
+class SearchIndexBuilder:
+    """Collects rows while the site is written and emits the index."""
+
+    def __init__(self):
+        self._hash = hashlib.sha1()
+        self._pages = []
+        self._page_ids = {}
+        self.columns = {"title": [], "year": [], "rating": [], "page": []}
+        self.tokens = {}
+
+    def add(self, title, data, page):
+        """Add one movie that is shown on the page file `page`."""
+        year = data.get("year") or 0
+        rating = round(float(data.get("rating") or 0.0), 1)
+        self._hash.update(f"{title}\0{year}\0{rating}\0{page}\n".encode())
+
+        if page not in self._page_ids:
+            self._page_ids[page] = len(self._pages)
+            self._pages.append(page)
+
+        row = len(self.columns["title"])
+        self.columns["title"].append(title)
+        self.columns["year"].append(year)
+        self.columns["rating"].append(rating)
+        self.columns["page"].append(self._page_ids[page])
+
+        for token in set(tokenize(title)):
+            self.tokens.setdefault(token, []).append(row)
+
+    @property
+    def fingerprint(self):
+        """Hash of everything added so far."""
+        return self._hash.hexdigest()
+
+    def to_dict(self):
+        """Return the JSON-ready index."""
+        return {
+            "version": INDEX_VERSION,
+            "fingerprint": self.fingerprint,
+            "pages": self._pages,
+            **self.columns,
+            "tokens": self.tokens,
+        }
+
+    def write(self, static_dir, base):
+        """
+        Write <base>-index.json unless an identical index already exists.
+
+        Returns True if the file was (re)written.
+        """
+        path = os.path.join(static_dir, index_filename(base))
+        if _stored_fingerprint(path) == self.fingerprint:
+            return False
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False,
+                      separators=(",", ":"))
+        os.replace(tmp_path, path)
+        return True
+
+
+def _stored_fingerprint(path):
+    """
+    Fingerprint of an existing index file, or None.
+
+    Only the header is read: "version" and "fingerprint" are always the
+    first two keys written.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            header = f.read(128)
+    except OSError:
+        return None
+
+    match = _HEADER_RE.match(header)
+    if not match or int(match.group(1)) != INDEX_VERSION:
+        return None
+    return match.group(2)
@@ -0,0 +1,40 @@
+"""
+Storage backends for the Movie App.
+
+Backends:
+- "sql"    -> storage.movie_storage_sql (SQLite via SQLAlchemy, default)
+- "memory" -> storage.movie_storage_memory (pure Python, for benchmarks)
+
+Pick one with get_storage(name) or the MOVIE_APP_STORAGE env variable.
+"""
+
+import importlib
+import os
+
+BACKENDS = {
+    "sql": "storage.movie_storage_sql",
+    "memory": "storage.movie_storage_memory",
+}
+
+DEFAULT_BACKEND = "sql"
+
+
+def get_storage(name=None, db_url=None):
+    """
+    Return the backend module for `name` (default: env or "sql").
+
+    `db_url` points the SQL backend at another database.
+    """
+    name = name or os.environ.get("MOVIE_APP_STORAGE", DEFAULT_BACKEND)
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown storage backend '{name}' "
+            f"(choose from {', '.join(BACKENDS)})."
+        )
+
+    backend = importlib.import_module(BACKENDS[name])
+    if db_url is not None:
+        if not hasattr(backend, "configure"):
+            raise ValueError(f"Backend '{name}' does not take a db_url.")
+        backend.configure(db_url=db_url)
+    return backend
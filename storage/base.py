@@ -0,0 +1,109 @@
+"""
+Storage backend protocol.
+
+A backend is any object (usually a module, e.g. storage.movie_storage_sql)
+exposing these functions and the exceptions from storage.errors.
+"""
+
+import random
+from typing import Dict, Iterator, List, Optional, Protocol, Tuple, Type
+
+from storage.errors import (
+    DatabaseBusyError,
+    MovieAlreadyExistsError,
+    MovieNotFoundError,
+    MovieStorageError,
+)
+
+MovieData = Dict[str, object]
+
+
+class MovieStorage(Protocol):
+    """Public API every storage backend implements."""
+
+    MovieStorageError: Type[MovieStorageError]
+    MovieNotFoundError: Type[MovieNotFoundError]
+    MovieAlreadyExistsError: Type[MovieAlreadyExistsError]
+    DatabaseBusyError: Type[DatabaseBusyError]
+
+    def list_users(self) -> List[Tuple[int, str]]:
+        """Return list of (id, name) sorted by name."""
+
+    def create_user(self, name: str) -> int:
+        """Create user if not exists. Returns user_id."""
+
+    def get_user_id(self, name: str) -> Optional[int]:
+        """Return user_id for name, or None."""
+
+    def list_movies(self, user_id: int) -> Dict[str, MovieData]:
+        """Return movies dict for one user, ordered by title."""
+
+    def iter_movies(self, user_id: int, order_by: str = "title",
+                    batch_size: int = 500) -> Iterator[Tuple[str, MovieData]]:
+        """Yield (title, data) ordered by "title", "rating" or "year"."""
+
+    def iter_ratings(self, batch_size: int = 5000
+                     ) -> Iterator[Tuple[int, str, float]]:
+        """Yield (user_id, title, rating) across all users."""
+
+    def random_movie(self, user_id: int, min_rating: Optional[float] = None,
+                     max_rating: Optional[float] = None,
+                     start_year: Optional[int] = None,
+                     end_year: Optional[int] = None,
+                     country: Optional[str] = None, weighted: bool = False,
+                     rng=random) -> Optional[Tuple[str, MovieData]]:
+        """Random (title, data) matching the filters, or None."""
+
+    def most_added_titles(self, limit: int = 10
+                          ) -> List[Tuple[str, int, float]]:
+        """[(title, adds, avg_rating)] for the most collected titles."""
+
+    def top_rated_titles(self, limit: int = 10, min_adds: int = 2
+                         ) -> List[Tuple[str, int, float]]:
+        """[(title, adds, avg_rating)] by community average rating."""
+
+    def country_counts(self, limit: Optional[int] = None
+                       ) -> List[Tuple[str, int]]:
+        """[(country, movies)] across all users, largest first."""
+
+    def refresh_summaries(self) -> None:
+        """Rebuild any materialized aggregates from scratch."""
+
+    def find_title(self, user_id: int, title_text: str) -> Optional[str]:
+        """Stored title with the same normalized key, or None."""
+
+    def search_titles_prefix(self, user_id: int, prefix: str,
+                             limit: int = 10) -> List[str]:
+        """Titles whose normalized key starts with the normalized prefix."""
+
+    def list_title_keys(self, user_id: int) -> List[Tuple[str, str]]:
+        """[(title, title_key)] for one user, ordered by title."""
+
+    def collection_version(self, user_id: int) -> int:
+        """The user's collection version (0 before the first change)."""
+
+    def changes_since(self, user_id: int, version: int,
+                      limit: Optional[int] = None
+                      ) -> Tuple[int, List[Tuple[int, str, str,
+                                                 Optional[MovieData]]]]:
+        """(new_version, [(version, op, title, current data or None)])."""
+
+    def last_change_seq(self) -> int:
+        """Seq of the newest change across all users (0 if none)."""
+
+    def changes_since_global(self, seq: int, limit: Optional[int] = None
+                             ) -> Tuple[int, List[Tuple[int, int, str, str,
+                                                        Optional[MovieData]]]]:
+        """(new_seq, [(seq, user_id, op, title, current data or None)])."""
+
+    def add_movie(self, user_id: int, title: str, year: int, rating: float,
+                  poster: str, imdb_id: str, country: str) -> None:
+        """Add a new movie; raise MovieAlreadyExistsError on duplicates."""
+
+    def delete_movie(self, user_id: int, title: str) -> None:
+        """Delete a movie; raise MovieNotFoundError if missing."""
+
+    def update_movie(self, user_id: int, title: str,
+                     rating: Optional[float] = None,
+                     note: Optional[str] = None) -> None:
+        """Update rating and/or note; raise MovieNotFoundError if missing."""
@@ -0,0 +1,17 @@
+"""Exceptions shared by all storage backends."""
+
+
+class MovieStorageError(Exception):
+    """Base class for storage related errors."""
+
+
+class MovieNotFoundError(MovieStorageError):
+    """Raised when a movie does not exist in the database."""
+
+
+class MovieAlreadyExistsError(MovieStorageError):
+    """Raised when adding a movie that already exists."""
+
+
+class DatabaseBusyError(MovieStorageError):
+    """Raised when a write keeps failing because the database is locked."""
@@ -0,0 +1,304 @@
+"""
+Pure in-memory storage backend (no SQL, no disk I/O).
+
+Implements the same public API as movie_storage_sql, so benchmarks and
+tests can measure CPU cost without database overhead. State lives in
+module-level dicts for the lifetime of the process; call reset() to
+start from an empty store.
+"""
+
+import bisect
+import random
+from collections import Counter
+
+from storage.errors import (  # noqa: F401  (re-exported for callers)
+    DatabaseBusyError,
+    MovieAlreadyExistsError,
+    MovieNotFoundError,
+    MovieStorageError,
+)
+from storage.normalize import normalize_title
+
+_users = {}       # name -> id
+_movies = {}      # user_id -> {title: data}
+_next_user_id = 1
+_title_keys = {}  # user_id -> sorted [(title_key, title)]
+_changes = {}     # user_id -> [(version, op, title)], version = index + 1
+_feed = []        # [(seq, user_id, op, title)] for all users, seq = index + 1
+
+
+def reset():
+    """Drop all users and movies."""
+    global _next_user_id  # pylint: disable=global-statement
+    _users.clear()
+    _movies.clear()
+    _title_keys.clear()
+    _changes.clear()
+    _feed.clear()
+    _next_user_id = 1
+
+
+def list_users():
+    """Return list of (id, name) sorted by name."""
+    return sorted(((uid, name) for name, uid in _users.items()),
+                  key=lambda u: u[1])
+
+
+def create_user(name):
+    """Create user if not exists. Returns user_id."""
+    global _next_user_id  # pylint: disable=global-statement
+    name = name.strip()
+    if name not in _users:
+        _users[name] = _next_user_id
+        _movies[_next_user_id] = {}
+        _next_user_id += 1
+    return _users[name]
+
+
+def get_user_id(name):
+    """Return user_id for name, or None."""
+    return _users.get(name)
+
+
+def list_movies(user_id):
+    """Return movies dict for one user."""
+    movies = _movies.get(user_id, {})
+    return {title: dict(movies[title]) for title in sorted(movies)}
+
+
+ITER_ORDERS = ("title", "rating", "year")
+
+
+def iter_movies(user_id, order_by="title", batch_size=500):
+    """Yield (title, data) for one user in `order_by` order."""
+    # batch_size only matters for the SQL backend.
+    del batch_size
+    if order_by not in ITER_ORDERS:
+        raise ValueError(f"order_by must be one of {ITER_ORDERS}")
+
+    movies = _movies.get(user_id, {})
+    if order_by == "title":
+        titles = sorted(movies)
+    else:
+        titles = sorted(movies, key=lambda t: (-movies[t][order_by], t))
+    for title in titles:
+        yield title, dict(movies[title])
+
+
+def iter_ratings(batch_size=5000):
+    """Yield (user_id, title, rating) for every movie of every user."""
+    del batch_size
+    for user_id, movies in list(_movies.items()):
+        for title, data in list(movies.items()):
+            yield user_id, title, data["rating"]
+
+
+def random_movie(user_id, min_rating=None, max_rating=None, start_year=None,
+                 end_year=None, country=None, weighted=False, rng=random):
+    """Return a random (title, data) matching the filters, or None."""
+    candidates = [
+        (title, data)
+        for title, data in _movies.get(user_id, {}).items()
+        if (min_rating is None or data["rating"] >= min_rating)
+        and (max_rating is None or data["rating"] <= max_rating)
+        and (start_year is None or data["year"] >= start_year)
+        and (end_year is None or data["year"] <= end_year)
+        and (country is None or data["country"] == country)
+    ]
+    if not candidates:
+        return None
+    if weighted and any(data["rating"] > 0 for _, data in candidates):
+        title, data = rng.choices(
+            candidates, weights=[data["rating"] for _, data in candidates]
+        )[0]
+    else:
+        title, data = rng.choice(candidates)
+    return title, dict(data)
+
+
+def _title_stats():
+    """Return {title: [adds, rating_sum]} computed over all users."""
+    stats = {}
+    for movies in _movies.values():
+        for title, data in movies.items():
+            entry = stats.setdefault(title, [0, 0.0])
+            entry[0] += 1
+            entry[1] += data["rating"]
+    return stats
+
+
+def refresh_summaries():
+    """Nothing is materialized in memory; aggregates are always current."""
+
+
+def most_added_titles(limit=10):
+    """Return [(title, adds, avg_rating)] for the most collected titles."""
+    stats = _title_stats()
+    ranked = sorted(stats.items(), key=lambda kv: (-kv[1][0], kv[0]))
+    return [(t, adds, total / adds) for t, (adds, total) in ranked[:limit]]
+
+
+def top_rated_titles(limit=10, min_adds=2):
+    """Return [(title, adds, avg_rating)] by community average rating."""
+    rows = [
+        (t, adds, total / adds)
+        for t, (adds, total) in _title_stats().items()
+        if adds >= min_adds
+    ]
+    rows.sort(key=lambda r: (-r[2], -r[1], r[0]))
+    return rows[:limit]
+
+
+def country_counts(limit=None):
+    """Return [(country, movies)] across all users, largest first."""
+    counts = Counter(
+        data["country"]
+        for movies in _movies.values()
+        for data in movies.values()
+        if data["country"]
+    )
+    ranked = sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))
+    return ranked if limit is None else ranked[:limit]
+
+
+def _keys(user_id):
+    """Sorted (title_key, title) pairs for a user, built on demand."""
+    keys = _title_keys.get(user_id)
+    if keys is None:
+        keys = sorted(
+            (normalize_title(title), title)
+            for title in _movies.get(user_id, {})
+        )
+        _title_keys[user_id] = keys
+    return keys
+
+
+def find_title(user_id, title_text):
+    """Return the stored title with the same normalized key, or None."""
+    key = normalize_title(title_text)
+    keys = _keys(user_id)
+    i = bisect.bisect_left(keys, (key, ""))
+    if i < len(keys) and keys[i][0] == key:
+        return keys[i][1]
+    return None
+
+
+def search_titles_prefix(user_id, prefix, limit=10):
+    """Return up to `limit` titles whose normalized key starts with prefix."""
+    key = normalize_title(prefix)
+    keys = _keys(user_id)
+    hits = []
+    for title_key, title in keys[bisect.bisect_left(keys, (key, "")):]:
+        if not title_key.startswith(key) or len(hits) >= limit:
+            break
+        hits.append(title)
+    return hits
+
+
+def list_title_keys(user_id):
+    """Return [(title, title_key)] for one user, ordered by title."""
+    return sorted((title, key) for key, title in _keys(user_id))
+
+
+def _log_change(user_id, op, title):
+    """Append to the user's change log, bumping the collection version."""
+    log = _changes.setdefault(user_id, [])
+    log.append((len(log) + 1, op, title))
+    _feed.append((len(_feed) + 1, user_id, op, title))
+
+
+def collection_version(user_id):
+    """Return the user's collection version (0 before the first change)."""
+    return len(_changes.get(user_id, ()))
+
+
+def changes_since(user_id, version, limit=None):
+    """
+    Return (new_version, [(version, op, title, data)]) after `version`.
+
+    data is the movie's current state, or None once it is deleted.
+    """
+    log = _changes.get(user_id, [])
+    selected = log[max(version, 0):]
+    if limit is not None:
+        selected = selected[:limit]
+    movies = _movies.get(user_id, {})
+    changes = [
+        (v, op, title, dict(movies[title]) if title in movies else None)
+        for v, op, title in selected
+    ]
+    new_version = changes[-1][0] if limit is not None and changes else len(log)
+    return new_version, changes
+
+
+def last_change_seq():
+    """Return the seq of the newest change across all users (0 if none)."""
+    return len(_feed)
+
+
+def changes_since_global(seq, limit=None):
+    """Return (new_seq, [(seq, user_id, op, title, data)]) after `seq`."""
+    selected = _feed[max(seq, 0):]
+    if limit is not None:
+        selected = selected[:limit]
+    changes = []
+    for s, user_id, op, title in selected:
+        movies = _movies.get(user_id, {})
+        data = dict(movies[title]) if title in movies else None
+        changes.append((s, user_id, op, title, data))
+    new_seq = changes[-1][0] if limit is not None and changes else len(_feed)
+    return new_seq, changes
+
+
+def add_movie(user_id, title, year, rating, poster, imdb_id, country):
+    """Add a new movie for a user."""
+    movies = _movies.setdefault(user_id, {})
+    if title in movies:
+        raise MovieAlreadyExistsError(
+            f"Movie '{title}' already exists for this user."
+        )
+    _title_keys.pop(user_id, None)
+    movies[title] = {
+        "year": year,
+        "rating": rating,
+        "poster": poster or "",
+        "imdb_id": imdb_id or "",
+        "country": country or "",
+        "note": "",
+    }
+    _log_change(user_id, "add", title)
+
+
+def delete_movie(user_id, title):
+    """Delete a movie for a user."""
+    _title_keys.pop(user_id, None)
+    try:
+        del _movies.get(user_id, {})[title]
+    except KeyError as exc:
+        raise MovieNotFoundError(
+            f"Movie '{title}' not found for this user."
+        ) from exc
+    _log_change(user_id, "delete", title)
+
+
+def update_movie(user_id, title, rating=None, note=None):
+    """
+    Update a movie's rating and/or note for a user.
+
+    Pass rating=None to keep rating unchanged.
+    Pass note=None to keep note unchanged.
+    """
+    if rating is None and note is None:
+        return
+
+    data = _movies.get(user_id, {}).get(title)
+    if data is None:
+        raise MovieNotFoundError(f"Movie '{title}' not found for this user.")
+
+    before = dict(data)
+    if rating is not None:
+        data["rating"] = rating
+    if note is not None:
+        data["note"] = note
+    if data != before:
+        _log_change(user_id, "update", title)
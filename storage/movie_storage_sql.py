@@ -6,31 +6,107 @@ Public API (used by movies.py):
 - create_user(name)
 - get_user_id(name)
 - list_movies(user_id)
+- iter_movies(user_id, order_by="title", batch_size=500)
+- iter_ratings(batch_size=5000)
+- random_movie(user_id, min_rating=None, ..., weighted=False)
+- most_added_titles(limit=10)
+- top_rated_titles(limit=10, min_adds=2)
+- country_counts(limit=None)
+- refresh_summaries()
+- find_title(user_id, text)
+- search_titles_prefix(user_id, prefix, limit=10)
+- list_title_keys(user_id)
+- collection_version(user_id)
+- changes_since(user_id, version, limit=None)
+- last_change_seq()
+- changes_since_global(seq, limit=None)
 - add_movie(user_id, title, year, rating, poster, imdb_id, country)
 - delete_movie(user_id, title)
 - update_movie(user_id, title, rating=None, note=None)
+- run_write(work)  (write transaction with lock retries)
+
+The engine is created on first use from DB_URL; call configure() to point
+the module at another database at runtime.
+
+Several processes may write to the same SQLite file, which is kept in WAL
+mode so readers never block writers. Every write runs in run_write(): a
+BEGIN IMMEDIATE transaction (the write lock is taken up front, so two
+writers never deadlock upgrading from a read lock), waiting up to
+BUSY_TIMEOUT seconds for the lock and retried with exponential backoff
+while the database stays locked. DatabaseBusyError is raised when the
+retries run out.
 """
 
 import os
+import random
+import sqlite3
+import time
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, make_url, text
+from sqlalchemy.exc import OperationalError
+
+from storage.errors import (  # noqa: F401  (re-exported for callers)
+    DatabaseBusyError,
+    MovieAlreadyExistsError,
+    MovieNotFoundError,
+    MovieStorageError,
+)
+from storage.normalize import normalize_title
 
 # project root
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-DB_PATH = os.path.join(BASE_DIR, "data", "movies.db")
-DB_URL = f"sqlite:///{DB_PATH}"
+DB_PATH = os.environ.get(
+    "MOVIE_APP_DB_PATH", os.path.join(BASE_DIR, "data", "movies.db")
+)
+DB_URL = os.environ.get("MOVIE_APP_DB_URL", f"sqlite:///{DB_PATH}")
+
+# Seconds SQLite waits for a lock before a statement fails.
+BUSY_TIMEOUT = float(os.environ.get("MOVIE_APP_BUSY_TIMEOUT", "5"))
+# Whole-transaction retries after that, with delays of
+# RETRY_BASE_DELAY * 2**attempt (jittered, capped at RETRY_MAX_DELAY).
+WRITE_RETRIES = int(os.environ.get("MOVIE_APP_WRITE_RETRIES", "5"))
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 2.0
 
-engine = create_engine(DB_URL, echo=False)
+# Stored in PRAGMA user_version once _create_schema() has run; bump it
+# whenever the schema changes.
+SCHEMA_VERSION = 2
 
+# Number of write transactions retried because the database was locked.
+lock_retries = 0
 
-def _ensure_data_dir() -> None:
-    """Ensure the data directory exists so SQLite can create the DB file."""
-    data_dir = os.path.dirname(DB_PATH)
+# Created lazily by get_engine()/configure() so importing this module
+# never touches the filesystem.
+engine = None
+
+
+def _ensure_data_dir(db_url) -> None:
+    """Ensure the directory of a SQLite DB file exists so it can be created."""
+    url = make_url(db_url)
+    if url.get_backend_name() != "sqlite":
+        return
+    database = url.database or ""
+    if database in ("", ":memory:") or database.startswith("file:"):
+        return
+    data_dir = os.path.dirname(os.path.abspath(database))
     os.makedirs(data_dir, exist_ok=True)
 
 
 def _init_db() -> None:
-    """Create tables if they do not exist."""
+    """
+    Create or upgrade the schema unless it is already current.
+
+    The check is a plain read of PRAGMA user_version, so starting another
+    process never waits for the write lock on an up-to-date database.
+    """
+    with engine.connect() as connection:
+        version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+    if version != SCHEMA_VERSION:
+        run_write(_create_schema)
+
+
+def _create_schema(connection) -> None:
+    """Create tables, indexes and summaries inside one transaction."""
     create_users_sql = """
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -48,35 +124,384 @@ def _init_db() -> None:
             imdb_id TEXT,
             country TEXT,
             note TEXT,
+            title_key TEXT,
             UNIQUE(user_id, title),
             FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
         )
     """
 
-    with engine.begin() as connection:
-        connection.execute(text(create_users_sql))
-        connection.execute(text(create_movies_sql))
+    create_indexes_sql = (
+        "CREATE INDEX IF NOT EXISTS idx_movies_user_rating "
+        "ON movies (user_id, rating DESC, title)",
+        "CREATE INDEX IF NOT EXISTS idx_movies_user_year "
+        "ON movies (user_id, year DESC, title)",
+        "CREATE INDEX IF NOT EXISTS idx_movies_user_id "
+        "ON movies (user_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_movies_user_title_key "
+        "ON movies (user_id, title_key)",
+        # Used by the GROUP BY queries that (re)build the summaries.
+        "CREATE INDEX IF NOT EXISTS idx_movies_title_rating "
+        "ON movies (title, rating)",
+        "CREATE INDEX IF NOT EXISTS idx_movies_country "
+        "ON movies (country)",
+    )
+
+    connection.execute(text(create_users_sql))
+    connection.execute(text(create_movies_sql))
+    _migrate_title_keys(connection)
+    for sql in create_indexes_sql:
+        connection.execute(text(sql))
+    _init_summaries(connection)
+    _init_changes(connection)
+    connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def _migrate_title_keys(connection) -> None:
+    """Add and backfill movies.title_key on databases created before it."""
+    columns = {
+        row[1]
+        for row in connection.execute(text("PRAGMA table_info(movies)"))
+    }
+    if "title_key" in columns:
+        return
+
+    connection.execute(text("ALTER TABLE movies ADD COLUMN title_key TEXT"))
+    rows = connection.execute(text("SELECT id, title FROM movies")).fetchall()
+    if rows:
+        connection.execute(
+            text("UPDATE movies SET title_key = :key WHERE id = :id"),
+            [{"id": r[0], "key": normalize_title(r[1])} for r in rows],
+        )
+
+
+# Materialized cross-user summaries, kept current by triggers on movies so
+# every writer (CLI, transfer imports, other processes) updates them in the
+# same transaction as the movie row itself.
+_SUMMARY_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS title_stats (
+        title TEXT PRIMARY KEY,
+        adds INTEGER NOT NULL,
+        rating_sum REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS country_stats (
+        country TEXT PRIMARY KEY,
+        adds INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_title_stats_adds "
+    "ON title_stats (adds DESC, title)",
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_movies_stats_insert
+    AFTER INSERT ON movies
+    BEGIN
+        INSERT INTO title_stats (title, adds, rating_sum)
+        VALUES (NEW.title, 1, NEW.rating)
+        ON CONFLICT(title) DO UPDATE SET
+            adds = adds + 1,
+            rating_sum = rating_sum + excluded.rating_sum;
+        INSERT INTO country_stats (country, adds)
+        VALUES (COALESCE(NEW.country, ''), 1)
+        ON CONFLICT(country) DO UPDATE SET adds = adds + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_movies_stats_delete
+    AFTER DELETE ON movies
+    BEGIN
+        UPDATE title_stats
+        SET adds = adds - 1, rating_sum = rating_sum - OLD.rating
+        WHERE title = OLD.title;
+        DELETE FROM title_stats WHERE title = OLD.title AND adds <= 0;
+        UPDATE country_stats SET adds = adds - 1
+        WHERE country = COALESCE(OLD.country, '');
+        DELETE FROM country_stats
+        WHERE country = COALESCE(OLD.country, '') AND adds <= 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_movies_stats_update
+    AFTER UPDATE OF title, rating, country ON movies
+    BEGIN
+        UPDATE title_stats
+        SET adds = adds - 1, rating_sum = rating_sum - OLD.rating
+        WHERE title = OLD.title;
+        DELETE FROM title_stats WHERE title = OLD.title AND adds <= 0;
+        INSERT INTO title_stats (title, adds, rating_sum)
+        VALUES (NEW.title, 1, NEW.rating)
+        ON CONFLICT(title) DO UPDATE SET
+            adds = adds + 1,
+            rating_sum = rating_sum + excluded.rating_sum;
+        UPDATE country_stats SET adds = adds - 1
+        WHERE country = COALESCE(OLD.country, '');
+        DELETE FROM country_stats
+        WHERE country = COALESCE(OLD.country, '') AND adds <= 0;
+        INSERT INTO country_stats (country, adds)
+        VALUES (COALESCE(NEW.country, ''), 1)
+        ON CONFLICT(country) DO UPDATE SET adds = adds + 1;
+    END
+    """,
+)
+
+
+def _rebuild_summaries(connection) -> None:
+    """Recompute the summary tables from movies with GROUP BY queries."""
+    connection.execute(text("DELETE FROM title_stats"))
+    connection.execute(text("DELETE FROM country_stats"))
+    connection.execute(text("""
+        INSERT INTO title_stats (title, adds, rating_sum)
+        SELECT title, COUNT(*), SUM(rating) FROM movies GROUP BY title
+    """))
+    connection.execute(text("""
+        INSERT INTO country_stats (country, adds)
+        SELECT COALESCE(country, ''), COUNT(*) FROM movies
+        GROUP BY COALESCE(country, '')
+    """))
+
+
+def _init_summaries(connection) -> None:
+    """Create summary tables/triggers and backfill them for existing data."""
+    has_triggers = connection.execute(text(
+        "SELECT 1 FROM sqlite_master "
+        "WHERE type = 'trigger' AND name = 'trg_movies_stats_insert'"
+    )).fetchone()
+
+    for sql in _SUMMARY_SCHEMA:
+        connection.execute(text(sql))
+
+    if not has_triggers:
+        _rebuild_summaries(connection)
+
+
+def _sqlite_connections(new_engine) -> None:
+    """
+    Set up SQLite connections for several concurrent processes.
+
+    WAL journaling lets readers and one writer work at the same time (in
+    rollback-journal mode any open reader blocks every commit). pysqlite
+    defers BEGIN until the first DML statement; turning that off and
+    emitting BEGIN ourselves lets writes open with BEGIN IMMEDIATE
+    (execution option sqlite_begin) while reads keep a deferred BEGIN.
+    """
+    @event.listens_for(new_engine, "connect")
+    def _on_connect(dbapi_connection, _record):
+        dbapi_connection.isolation_level = None
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+    @event.listens_for(new_engine, "begin")
+    def _on_begin(connection):
+        mode = connection.get_execution_options().get("sqlite_begin")
+        connection.exec_driver_sql(f"BEGIN {mode}" if mode else "BEGIN")
+
+
+# Per-user collection versions and an append-only change log, written by
+# triggers in the same transaction as the movie row. Version n of a user's
+# collection is the state after change n; consumers remember the version
+# they have seen and ask changes_since() for the rest. changes.seq orders
+# all users' changes (writers are serialized, so in commit order) for
+# consumers that follow every collection (changes_since_global()).
+_CHANGES_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS collection_versions (
+        user_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        version INTEGER NOT NULL,
+        op TEXT NOT NULL,
+        title TEXT NOT NULL,
+        changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (user_id, version)
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_movies_changes_insert
+    AFTER INSERT ON movies
+    BEGIN
+        INSERT INTO collection_versions (user_id, version)
+        VALUES (NEW.user_id, 1)
+        ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+        INSERT INTO changes (user_id, version, op, title)
+        SELECT user_id, version, 'add', NEW.title
+        FROM collection_versions WHERE user_id = NEW.user_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_movies_changes_delete
+    AFTER DELETE ON movies
+    BEGIN
+        INSERT INTO collection_versions (user_id, version)
+        VALUES (OLD.user_id, 1)
+        ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+        INSERT INTO changes (user_id, version, op, title)
+        SELECT user_id, version, 'delete', OLD.title
+        FROM collection_versions WHERE user_id = OLD.user_id;
+    END
+    """,
+    # Upserts that rewrite identical values are not changes.
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_movies_changes_update
+    AFTER UPDATE OF year, rating, poster, imdb_id, country, note ON movies
+    WHEN OLD.year IS NOT NEW.year OR OLD.rating IS NOT NEW.rating
+        OR OLD.poster IS NOT NEW.poster OR OLD.imdb_id IS NOT NEW.imdb_id
+        OR OLD.country IS NOT NEW.country OR OLD.note IS NOT NEW.note
+    BEGIN
+        INSERT INTO collection_versions (user_id, version)
+        VALUES (NEW.user_id, 1)
+        ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+        INSERT INTO changes (user_id, version, op, title)
+        SELECT user_id, version, 'update', NEW.title
+        FROM collection_versions WHERE user_id = NEW.user_id;
+    END
+    """,
+)
+
+
+def _init_changes(connection) -> None:
+    """
+    Create the change log and its triggers.
+
+    On a database that predates them every existing movie is logged as an
+    'add', so changes_since(user_id, 0) always rebuilds a full collection.
+    """
+    has_triggers = connection.execute(text(
+        "SELECT 1 FROM sqlite_master "
+        "WHERE type = 'trigger' AND name = 'trg_movies_changes_insert'"
+    )).fetchone()
+    _migrate_changes_seq(connection)
+
+    for sql in _CHANGES_SCHEMA:
+        connection.execute(text(sql))
+
+    if not has_triggers:
+        connection.execute(text("""
+            INSERT OR IGNORE INTO changes (user_id, version, op, title)
+            SELECT user_id,
+                   ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY id),
+                   'add', title
+            FROM movies
+        """))
+        connection.execute(text("""
+            INSERT OR IGNORE INTO collection_versions (user_id, version)
+            SELECT user_id, COUNT(*) FROM movies GROUP BY user_id
+        """))
+
+
+def _migrate_changes_seq(connection) -> None:
+    """Rebuild a changes table created before it had the global seq."""
+    columns = {
+        row[1]
+        for row in connection.execute(text("PRAGMA table_info(changes)"))
+    }
+    if not columns or "seq" in columns:
+        return
+
+    # The triggers would follow the rename; _CHANGES_SCHEMA recreates them.
+    for op in ("insert", "delete", "update"):
+        connection.execute(text(f"DROP TRIGGER trg_movies_changes_{op}"))
+    connection.execute(text("ALTER TABLE changes RENAME TO changes_old"))
+    connection.execute(text(_CHANGES_SCHEMA[1]))
+    connection.execute(text("""
+        INSERT INTO changes (seq, user_id, version, op, title, changed_at)
+        SELECT rowid, user_id, version, op, title, changed_at
+        FROM changes_old ORDER BY rowid
+    """))
+    connection.execute(text("DROP TABLE changes_old"))
+
+
+def configure(db_url=None, db_path=None, busy_timeout=None):
+    """
+    (Re)create the engine for a database chosen at runtime.
+
+    Pass either a full SQLAlchemy URL or a SQLite file path; with neither,
+    DB_URL (env MOVIE_APP_DB_URL / MOVIE_APP_DB_PATH) is used.
+    `busy_timeout` overrides BUSY_TIMEOUT (seconds) for SQLite.
+    Returns the new engine.
+    """
+    global engine  # pylint: disable=global-statement
+
+    if db_url is None:
+        db_url = f"sqlite:///{db_path}" if db_path else DB_URL
 
+    if engine is not None:
+        engine.dispose()
+
+    _ensure_data_dir(db_url)
+    if make_url(db_url).get_backend_name() == "sqlite":
+        timeout = BUSY_TIMEOUT if busy_timeout is None else busy_timeout
+        engine = create_engine(
+            db_url, echo=False, connect_args={"timeout": timeout}
+        )
+        _sqlite_connections(engine)
+    else:
+        engine = create_engine(db_url, echo=False)
+    _init_db()
+    return engine
 
-_ensure_data_dir()
-_init_db()
 
+def get_engine():
+    """Return the engine, creating it from DB_URL on first use."""
+    if engine is None:
+        configure()
+    return engine
 
-class MovieStorageError(Exception):
-    """Base class for storage related errors."""
 
+def _is_locked(exc) -> bool:
+    """True if `exc` means another connection holds the database lock."""
+    orig = getattr(exc, "orig", None)
+    if getattr(orig, "sqlite_errorcode", None) in (
+        sqlite3.SQLITE_BUSY,
+        sqlite3.SQLITE_LOCKED,
+    ):
+        return True
+    return "database is locked" in str(orig or exc)
 
-class MovieNotFoundError(MovieStorageError):
-    """Raised when a movie does not exist in the database."""
 
+def run_write(work, retries=None):
+    """
+    Run `work(connection)` in a write transaction and return its result.
+
+    The transaction starts with BEGIN IMMEDIATE on SQLite. If the database
+    is still locked after the busy timeout, the whole transaction is rolled
+    back and `work` runs again after a backoff delay, so it must not have
+    side effects outside the connection. Raises DatabaseBusyError when all
+    retries fail.
+    """
+    global lock_retries  # pylint: disable=global-statement
 
-class MovieAlreadyExistsError(MovieStorageError):
-    """Raised when adding a movie that already exists."""
+    retries = WRITE_RETRIES if retries is None else retries
+    attempt = 0
+    while True:
+        try:
+            with get_engine().connect() as connection:
+                connection = connection.execution_options(
+                    sqlite_begin="IMMEDIATE"
+                )
+                with connection.begin():
+                    return work(connection)
+        except OperationalError as exc:
+            if not _is_locked(exc):
+                raise
+            if attempt >= retries:
+                raise DatabaseBusyError(
+                    "The database is locked by another process; "
+                    "please try again."
+                ) from exc
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+            attempt += 1
+            lock_retries += 1
 
 
 def list_users():
     """Return list of (id, name) sorted by name."""
-    with engine.connect() as connection:
+    with get_engine().connect() as connection:
         rows = connection.execute(
             text("SELECT id, name FROM users ORDER BY name")
         ).fetchall()
@@ -86,22 +511,23 @@ def list_users():
 def create_user(name):
     """Create user if not exists. Returns user_id."""
     name = name.strip()
-    with engine.begin() as connection:
+
+    def work(connection):
         connection.execute(
             text("INSERT OR IGNORE INTO users (name) VALUES (:name)"),
             {"name": name},
         )
-        row = connection.execute(
+        return connection.execute(
             text("SELECT id FROM users WHERE name = :name"),
             {"name": name},
-        ).fetchone()
+        ).scalar_one()
 
-    return int(row[0])
+    return int(run_write(work))
 
 
 def get_user_id(name):
     """Return user_id for name, or None."""
-    with engine.connect() as connection:
+    with get_engine().connect() as connection:
         row = connection.execute(
             text("SELECT id FROM users WHERE name = :name"),
             {"name": name},
@@ -117,35 +543,460 @@ def list_movies(user_id):
         WHERE user_id = :uid
         ORDER BY title
     """
-    with engine.connect() as connection:
+    with get_engine().connect() as connection:
         rows = connection.execute(text(sql), {"uid": user_id}).fetchall()
 
-    return {
-        r[0]: {
-            "year": r[1],
-            "rating": r[2],
-            "poster": r[3] or "",
-            "imdb_id": r[4] or "",
-            "country": r[5] or "",
-            "note": r[6] or "",
-        }
-        for r in rows
+    return dict(_row_to_movie(r) for r in rows)
+
+
+def _row_to_movie(r):
+    """Convert a (title, year, rating, poster, imdb_id, country, note) row."""
+    return r[0], {
+        "year": r[1],
+        "rating": r[2],
+        "poster": r[3] or "",
+        "imdb_id": r[4] or "",
+        "country": r[5] or "",
+        "note": r[6] or "",
     }
 
 
+# order_by -> (ORDER BY clause, keyset predicate continuing after :k, :t)
+_ITER_ORDERS = {
+    "title": ("title", "title > :t"),
+    "rating": (
+        "rating DESC, title",
+        "(rating < :k OR (rating = :k AND title > :t))",
+    ),
+    "year": (
+        "year DESC, title",
+        "(year < :k OR (year = :k AND title > :t))",
+    ),
+}
+
+ITER_ORDERS = tuple(_ITER_ORDERS)
+
+
+def iter_movies(user_id, order_by="title", batch_size=500):
+    """
+    Yield (title, data) for one user in `order_by` order.
+
+    Rows are fetched in keyset-paginated batches of `batch_size`, each in
+    its own short read, so memory stays bounded and no read transaction
+    is held open while the caller works on the rows.
+    """
+    if order_by not in _ITER_ORDERS:
+        raise ValueError(f"order_by must be one of {ITER_ORDERS}")
+
+    order_sql, after_sql = _ITER_ORDERS[order_by]
+    key_column = {"rating": 2, "year": 1}.get(order_by)
+    base_sql = """
+        SELECT title, year, rating, poster, imdb_id, country, note
+        FROM movies
+        WHERE user_id = :uid {after}
+        ORDER BY {order}
+        LIMIT :limit
+    """
+    params = {"uid": user_id, "limit": batch_size}
+    after = ""
+
+    while True:
+        sql = base_sql.format(after=after, order=order_sql)
+        with get_engine().connect() as connection:
+            rows = connection.execute(text(sql), params).fetchall()
+
+        for r in rows:
+            yield _row_to_movie(r)
+
+        if len(rows) < batch_size:
+            return
+
+        last = rows[-1]
+        params["t"] = last[0]
+        if key_column is not None:
+            params["k"] = last[key_column]
+        after = f"AND {after_sql}"
+
+
+def iter_ratings(batch_size=5000):
+    """
+    Yield (user_id, title, rating) for every movie of every user.
+
+    Rows are read in id-ordered batches so memory stays bounded.
+    """
+    sql = """
+        SELECT id, user_id, title, rating
+        FROM movies
+        WHERE id > :last
+        ORDER BY id
+        LIMIT :limit
+    """
+    last = 0
+    while True:
+        with get_engine().connect() as connection:
+            rows = connection.execute(
+                text(sql), {"last": last, "limit": batch_size}
+            ).fetchall()
+
+        for r in rows:
+            yield r[1], r[2], r[3]
+
+        if len(rows) < batch_size:
+            return
+        last = rows[-1][0]
+
+
+MAX_RATING = 10.0
+RANDOM_MAX_ATTEMPTS = 32
+
+
+def _movie_filters(min_rating=None, max_rating=None, start_year=None,
+                   end_year=None, country=None):
+    """Return (SQL fragment, params) for optional movie predicates."""
+    clauses = []
+    params = {}
+    for column, op, name, value in (
+        ("rating", ">=", "min_rating", min_rating),
+        ("rating", "<=", "max_rating", max_rating),
+        ("year", ">=", "start_year", start_year),
+        ("year", "<=", "end_year", end_year),
+        ("country", "=", "country", country),
+    ):
+        if value is not None:
+            clauses.append(f"{column} {op} :{name}")
+            params[name] = value
+    sql = "".join(f" AND {clause}" for clause in clauses)
+    return sql, params
+
+
+def _matches(data, min_rating=None, max_rating=None, start_year=None,
+             end_year=None, country=None):
+    """Python twin of _movie_filters() for one movie dict."""
+    return (
+        (min_rating is None or data["rating"] >= min_rating)
+        and (max_rating is None or data["rating"] <= max_rating)
+        and (start_year is None or data["year"] >= start_year)
+        and (end_year is None or data["year"] <= end_year)
+        and (country is None or data["country"] == country)
+    )
+
+
+def random_movie(user_id, min_rating=None, max_rating=None, start_year=None,
+                 end_year=None, country=None, weighted=False, rng=random):
+    """
+    Return a random (title, data) for a user matching the filters, or None.
+
+    Uses id probes instead of ORDER BY RANDOM(): pick a random id between
+    the user's lowest and highest id and look up exactly that row (one
+    primary-key seek). Ids are global, so a probe that lands on a gap or
+    on another user's movie is rejected, which keeps every row of the
+    user equally likely. A hit that misses the filters, or (with
+    weighted=True) fails the rating / MAX_RATING acceptance test, is
+    rejected as well. After RANDOM_MAX_ATTEMPTS rejections (sparse ids or
+    selective filters) the pick is made exactly over the matching rows in
+    SQL instead.
+    """
+    filters = (min_rating, max_rating, start_year, end_year, country)
+    params = {"uid": user_id}
+
+    bounds_sql = """
+        SELECT
+            (SELECT id FROM movies WHERE user_id = :uid ORDER BY id LIMIT 1),
+            (SELECT id FROM movies WHERE user_id = :uid
+             ORDER BY id DESC LIMIT 1)
+    """
+    probe_sql = text("""
+        SELECT title, year, rating, poster, imdb_id, country, note
+        FROM movies
+        WHERE id = :pivot AND user_id = :uid
+    """)
+
+    with get_engine().connect() as connection:
+        low, high = connection.execute(text(bounds_sql), params).fetchone()
+        if low is None:
+            return None
+
+        for _ in range(RANDOM_MAX_ATTEMPTS):
+            params["pivot"] = rng.randint(low, high)
+            row = connection.execute(probe_sql, params).fetchone()
+            if row is None:
+                continue
+            title, data = _row_to_movie(row)
+            if not _matches(data, *filters):
+                continue
+            if not weighted or rng.random() * MAX_RATING < data["rating"]:
+                return title, data
+
+        return _random_movie_exact(connection, user_id, filters, weighted,
+                                   rng)
+
+
+def _random_movie_exact(connection, user_id, filters, weighted, rng):
+    """
+    Fallback for random_movie(): pick among all matching rows in SQL.
+
+    Weighted picks walk a running SUM(rating) window and take the first
+    row whose cumulative weight passes a random fraction of the total;
+    if every weight is 0 the pick falls back to a uniform one.
+    """
+    filters_sql, params = _movie_filters(*filters)
+    params["uid"] = user_id
+    where = f"WHERE user_id = :uid{filters_sql}"
+    columns = "title, year, rating, poster, imdb_id, country, note"
+
+    if weighted:
+        params["u"] = rng.random()
+        row = connection.execute(
+            text(f"""
+                SELECT {columns}
+                FROM (
+                    SELECT {columns}, id,
+                        SUM(MAX(rating, 0)) OVER (ORDER BY id) AS running,
+                        SUM(MAX(rating, 0)) OVER () AS total
+                    FROM movies {where}
+                )
+                WHERE running > :u * total
+                ORDER BY id
+                LIMIT 1
+            """),
+            params,
+        ).fetchone()
+        if row is not None:
+            return _row_to_movie(row)
+        del params["u"]
+
+    count = connection.execute(
+        text(f"SELECT COUNT(*) FROM movies {where}"), params
+    ).scalar()
+    if not count:
+        return None
+    params["offset"] = rng.randrange(count)
+    row = connection.execute(
+        text(f"""
+            SELECT {columns}
+            FROM movies {where}
+            ORDER BY id
+            LIMIT 1 OFFSET :offset
+        """),
+        params,
+    ).fetchone()
+    return _row_to_movie(row)
+
+
+def refresh_summaries():
+    """Rebuild the cross-user summary tables from scratch."""
+    run_write(_rebuild_summaries)
+
+
+def most_added_titles(limit=10):
+    """Return [(title, adds, avg_rating)] for the most collected titles."""
+    sql = """
+        SELECT title, adds, rating_sum / adds
+        FROM title_stats
+        ORDER BY adds DESC, title
+        LIMIT :limit
+    """
+    with get_engine().connect() as connection:
+        rows = connection.execute(text(sql), {"limit": limit}).fetchall()
+    return [(r[0], r[1], r[2]) for r in rows]
+
+
+def top_rated_titles(limit=10, min_adds=2):
+    """Return [(title, adds, avg_rating)] by community average rating."""
+    sql = """
+        SELECT title, adds, rating_sum / adds AS avg_rating
+        FROM title_stats
+        WHERE adds >= :min_adds
+        ORDER BY avg_rating DESC, adds DESC, title
+        LIMIT :limit
+    """
+    with get_engine().connect() as connection:
+        rows = connection.execute(
+            text(sql), {"limit": limit, "min_adds": min_adds}
+        ).fetchall()
+    return [(r[0], r[1], r[2]) for r in rows]
+
+
+def country_counts(limit=None):
+    """Return [(country, movies)] across all users, largest first."""
+    sql = """
+        SELECT country, adds
+        FROM country_stats
+        WHERE country != ''
+        ORDER BY adds DESC, country
+        LIMIT :limit
+    """
+    with get_engine().connect() as connection:
+        rows = connection.execute(
+            text(sql), {"limit": -1 if limit is None else limit}
+        ).fetchall()
+    return [(r[0], r[1]) for r in rows]
+
+
+def find_title(user_id, title_text):
+    """
+    Return the stored title whose normalized key equals that of
+    `title_text` (case, accents and spacing ignored), or None.
+    """
+    sql = """
+        SELECT title FROM movies
+        WHERE user_id = :uid AND title_key = :key
+        ORDER BY title
+        LIMIT 1
+    """
+    with get_engine().connect() as connection:
+        row = connection.execute(
+            text(sql), {"uid": user_id, "key": normalize_title(title_text)}
+        ).fetchone()
+    return row[0] if row else None
+
+
+def search_titles_prefix(user_id, prefix, limit=10):
+    """Return up to `limit` titles whose normalized key starts with prefix."""
+    key = normalize_title(prefix)
+    # Range scan on (user_id, title_key): key <= title_key < key + U+10FFFF
+    sql = """
+        SELECT title FROM movies
+        WHERE user_id = :uid AND title_key >= :low AND title_key < :high
+        ORDER BY title_key, title
+        LIMIT :limit
+    """
+    params = {
+        "uid": user_id,
+        "low": key,
+        "high": key + "\U0010ffff",
+        "limit": limit,
+    }
+    with get_engine().connect() as connection:
+        rows = connection.execute(text(sql), params).fetchall()
+    return [r[0] for r in rows]
+
+
+def list_title_keys(user_id):
+    """Return [(title, title_key)] for one user, ordered by title."""
+    sql = """
+        SELECT title, title_key FROM movies
+        WHERE user_id = :uid
+        ORDER BY title
+    """
+    with get_engine().connect() as connection:
+        rows = connection.execute(text(sql), {"uid": user_id}).fetchall()
+    return [(r[0], r[1]) for r in rows]
+
+
+_VERSION_SQL = "SELECT version FROM collection_versions WHERE user_id = :uid"
+
+
+def collection_version(user_id):
+    """Return the user's collection version (0 before the first change)."""
+    with get_engine().connect() as connection:
+        version = connection.execute(
+            text(_VERSION_SQL), {"uid": user_id}
+        ).scalar()
+    return version or 0
+
+
+def changes_since(user_id, version, limit=None):
+    """
+    Return (new_version, [(version, op, title, data)]) after `version`.
+
+    op is "add", "update" or "delete", oldest first. data is the movie's
+    current state, or None once it is deleted, so applying the list in
+    order to a copy at `version` yields the collection at new_version.
+    With `limit`, new_version is the last change returned; call again to
+    continue.
+    """
+    sql = """
+        SELECT c.version, c.op, c.title,
+               m.year, m.rating, m.poster, m.imdb_id, m.country, m.note
+        FROM changes c
+        LEFT JOIN movies m ON m.user_id = c.user_id AND m.title = c.title
+        WHERE c.user_id = :uid AND c.version > :version
+        ORDER BY c.version
+        LIMIT :limit
+    """
+    params = {
+        "uid": user_id,
+        "version": version,
+        "limit": -1 if limit is None else limit,
+    }
+    with get_engine().connect() as connection:
+        rows = connection.execute(text(sql), params).fetchall()
+        if limit is None or len(rows) < limit:
+            current = connection.execute(
+                text(_VERSION_SQL), {"uid": user_id}
+            ).scalar()
+        else:
+            current = rows[-1][0]
+
+    changes = [
+        (r[0], r[1], r[2], None if r[3] is None else _row_to_movie(r[2:])[1])
+        for r in rows
+    ]
+    return current or 0, changes
+
+
+def last_change_seq():
+    """Return the seq of the newest change across all users (0 if none)."""
+    with get_engine().connect() as connection:
+        seq = connection.execute(
+            text("SELECT MAX(seq) FROM changes")
+        ).scalar()
+    return seq or 0
+
+
+def changes_since_global(seq, limit=None):
+    """
+    Return (new_seq, [(seq, user_id, op, title, data)]) after `seq`.
+
+    Like changes_since() but for every user in one indexed range scan, for
+    consumers that follow all collections (e.g. the recommender).
+    """
+    sql = """
+        SELECT c.seq, c.user_id, c.op, c.title,
+               m.year, m.rating, m.poster, m.imdb_id, m.country, m.note
+        FROM changes c
+        LEFT JOIN movies m ON m.user_id = c.user_id AND m.title = c.title
+        WHERE c.seq > :seq
+        ORDER BY c.seq
+        LIMIT :limit
+    """
+    params = {"seq": seq, "limit": -1 if limit is None else limit}
+    with get_engine().connect() as connection:
+        rows = connection.execute(text(sql), params).fetchall()
+        if limit is None or len(rows) < limit:
+            current = connection.execute(
+                text("SELECT MAX(seq) FROM changes")
+            ).scalar()
+        else:
+            current = rows[-1][0]
+
+    changes = [
+        (
+            r[0], r[1], r[2], r[3],
+            None if r[4] is None else _row_to_movie(r[3:])[1],
+        )
+        for r in rows
+    ]
+    return current or 0, changes
+
+
 def add_movie(user_id, title, year, rating, poster, imdb_id, country):
     """Add a new movie for a user."""
     sql = """
         INSERT INTO movies (
-            user_id, title, year, rating, poster, imdb_id, country, note
+            user_id, title, year, rating, poster, imdb_id, country, note,
+            title_key
         )
         VALUES (
-            :user_id, :title, :year, :rating, :poster, :imdb_id, :country, :note
+            :user_id, :title, :year, :rating, :poster, :imdb_id, :country,
+            :note, :title_key
         )
     """
     params = {
         "user_id": user_id,
         "title": title,
+        "title_key": normalize_title(title),
         "year": year,
         "rating": rating,
         "poster": poster or "",
@@ -155,8 +1006,7 @@ def add_movie(user_id, title, year, rating, poster, imdb_id, country):
     }
 
     try:
-        with engine.begin() as connection:
-            connection.execute(text(sql), params)
+        run_write(lambda connection: connection.execute(text(sql), params))
     except Exception as exc:
         if "UNIQUE constraint failed" in str(exc):
             raise MovieAlreadyExistsError(
@@ -167,11 +1017,10 @@ def add_movie(user_id, title, year, rating, poster, imdb_id, country):
 
 def delete_movie(user_id, title):
     """Delete a movie for a user."""
-    with engine.begin() as connection:
-        result = connection.execute(
-            text("DELETE FROM movies WHERE user_id = :user_id AND title = :title"),
-            {"user_id": user_id, "title": title},
-        )
+    result = run_write(lambda connection: connection.execute(
+        text("DELETE FROM movies WHERE user_id = :user_id AND title = :title"),
+        {"user_id": user_id, "title": title},
+    ))
 
     if result.rowcount == 0:
         raise MovieNotFoundError(f"Movie '{title}' not found for this user.")
@@ -204,8 +1053,9 @@ def update_movie(user_id, title, rating=None, note=None):
         WHERE user_id = :user_id AND title = :title
     """
 
-    with engine.begin() as connection:
-        result = connection.execute(text(sql), params)
+    result = run_write(
+        lambda connection: connection.execute(text(sql), params)
+    )
 
     if result.rowcount == 0:
         raise MovieNotFoundError(f"Movie '{title}' not found for this user.")
@@ -0,0 +1,331 @@
+"""
+Streaming export/import of the users and movies tables.
+
+Rows are moved one at a time as NDJSON (one JSON object per line) or CSV,
+so a collection of any size can be backed up or migrated with constant
+memory:
+- export reads in short id-ordered (keyset) batches, each in its own
+  read transaction, so a long export never holds the database open
+- import reads lazily, upserts in chunks, one transaction per chunk
+
+Movies are exported with their owner's user name next to user_id, so an
+import into another instance maps rows onto that instance's user ids.
+"""
+
+import csv
+import json
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from storage import movie_storage_sql
+from storage.normalize import normalize_title
+
+FORMATS = ("ndjson", "csv")
+TABLES = ("users", "movies")
+
+DEFAULT_CHUNK_SIZE = 1000
+
+USER_COLUMNS = ("id", "name")
+MOVIE_COLUMNS = (
+    "user_id",
+    "user",
+    "title",
+    "year",
+    "rating",
+    "poster",
+    "imdb_id",
+    "country",
+    "note",
+)
+
+# First column is the keyset position; the rest match the table's columns.
+_EXPORT_SQL = {
+    "users": """
+        SELECT id, id, name FROM users
+        WHERE id > :last
+        ORDER BY id
+        LIMIT :limit
+    """,
+    "movies": """
+        SELECT m.id, m.user_id, u.name, m.title, m.year, m.rating,
+               m.poster, m.imdb_id, m.country, m.note
+        FROM movies m
+        JOIN users u ON u.id = m.user_id
+        WHERE m.id > :last
+        ORDER BY m.id
+        LIMIT :limit
+    """,
+}
+
+_UPSERT_MOVIE_SQL = """
+    INSERT INTO movies (
+        user_id, title, year, rating, poster, imdb_id, country, note,
+        title_key
+    )
+    VALUES (
+        :user_id, :title, :year, :rating, :poster, :imdb_id, :country, :note,
+        :title_key
+    )
+    ON CONFLICT(user_id, title) DO UPDATE SET
+        title_key = excluded.title_key,
+        year = excluded.year,
+        rating = excluded.rating,
+        poster = excluded.poster,
+        imdb_id = excluded.imdb_id,
+        country = excluded.country,
+        note = excluded.note
+"""
+
+
+class TransferError(movie_storage_sql.MovieStorageError):
+    """Raised when an export/import cannot be performed."""
+
+
+class TransferStats:
+    """Row count and timing of one export or import run."""
+
+    def __init__(self):
+        self.rows = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def tick(self, count=1):
+        """Account for `count` more rows and refresh elapsed time."""
+        self.rows += count
+        self.elapsed = time.perf_counter() - self.started
+
+    @property
+    def rows_per_sec(self):
+        """Throughput in rows per second (0 before any time has passed)."""
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.rows} rows in {self.elapsed:.2f}s "
+            f"({self.rows_per_sec:,.0f} rows/s)"
+        )
+
+
+def _check(table, fmt):
+    """Validate table and format names."""
+    if table not in TABLES:
+        raise TransferError(f"Unknown table '{table}' (use {TABLES}).")
+    if fmt not in FORMATS:
+        raise TransferError(f"Unknown format '{fmt}' (use {FORMATS}).")
+
+
+def _columns(table):
+    """Return the exported column names for a table."""
+    return USER_COLUMNS if table == "users" else MOVIE_COLUMNS
+
+
+def iter_rows(table, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield rows of `table` as dicts.
+
+    Rows are read in id-ordered batches of `chunk_size`, one short read
+    transaction each, so writers are never locked out while a consumer
+    works through the export.
+    """
+    _check(table, "ndjson")
+    columns = _columns(table)
+    sql = text(_EXPORT_SQL[table])
+    last = 0
+    while True:
+        with movie_storage_sql.get_engine().connect() as connection:
+            rows = connection.execute(
+                sql, {"last": last, "limit": chunk_size}
+            ).fetchall()
+
+        for row in rows:
+            yield dict(zip(columns, row[1:]))
+
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1][0]
+
+
+def export_table(out, table, fmt="ndjson", progress=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream `table` to the text file object `out`.
+
+    `progress(stats)` is called after every `chunk_size` rows.
+    Returns a TransferStats.
+    """
+    _check(table, fmt)
+    stats = TransferStats()
+
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=_columns(table))
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(row):
+            out.write(json.dumps(row, ensure_ascii=False))
+            out.write("\n")
+
+    for row in iter_rows(table, chunk_size):
+        write(row)
+        stats.tick()
+        if progress and stats.rows % chunk_size == 0:
+            progress(stats)
+
+    stats.tick(0)
+    return stats
+
+
+def _read_rows(src, fmt):
+    """Lazily yield dict rows from an NDJSON or CSV text file object."""
+    if fmt == "csv":
+        yield from csv.DictReader(src)
+        return
+
+    for line_no, line in enumerate(src, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            raise TransferError(
+                f"Invalid JSON on line {line_no}: {exc}"
+            ) from exc
+        if not isinstance(row, dict):
+            raise TransferError(
+                f"Line {line_no} is not a JSON object: {line[:80]}"
+            )
+        yield row
+
+
+def _chunks(rows, size):
+    """Group an iterable into lists of at most `size` items."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _resolve_user_id(connection, row, user_ids):
+    """Map a movie row to a local user id, creating the user if needed."""
+    name = (row.get("user") or "").strip()
+    if not name:
+        try:
+            user_id = int(row["user_id"])
+        except (KeyError, TypeError, ValueError) as exc:
+            raise TransferError(
+                f"Movie row without user or user_id: {row!r}"
+            ) from exc
+        # Bare ids are cached under int keys, names under str keys.
+        if user_id not in user_ids:
+            if connection.execute(
+                text("SELECT 1 FROM users WHERE id = :id"), {"id": user_id}
+            ).first() is None:
+                raise TransferError(
+                    f"Movie row for unknown user_id {user_id}: {row!r}"
+                )
+            user_ids[user_id] = user_id
+        return user_ids[user_id]
+
+    if name not in user_ids:
+        connection.execute(
+            text("INSERT OR IGNORE INTO users (name) VALUES (:name)"),
+            {"name": name},
+        )
+        user_ids[name] = connection.execute(
+            text("SELECT id FROM users WHERE name = :name"),
+            {"name": name},
+        ).scalar_one()
+    return user_ids[name]
+
+
+def _movie_params(connection, row, user_ids):
+    """Convert an imported movie row into upsert parameters."""
+    title = row.get("title")
+    if not isinstance(title, str) or not title.strip():
+        raise TransferError(f"Invalid movie row {row!r}: missing title")
+    try:
+        return {
+            "user_id": _resolve_user_id(connection, row, user_ids),
+            "title": title,
+            "title_key": normalize_title(title),
+            "year": int(row.get("year") or 0),
+            "rating": float(row.get("rating") or 0.0),
+            "poster": row.get("poster") or "",
+            "imdb_id": row.get("imdb_id") or "",
+            "country": row.get("country") or "",
+            "note": row.get("note") or "",
+        }
+    except (AttributeError, KeyError, TypeError, ValueError) as exc:
+        raise TransferError(f"Invalid movie row {row!r}: {exc}") from exc
+
+
+def _user_name(row):
+    """Return the stripped "name" of an imported user row."""
+    name = row.get("name") or ""
+    if not isinstance(name, str):
+        raise TransferError(f"Invalid user row {row!r}: name is not text")
+    return name.strip()
+
+
+def _import_chunk(connection, table, chunk, user_ids):
+    """
+    Write one chunk of imported rows inside an open transaction.
+
+    Returns `user_ids` extended with the users resolved by this chunk. The
+    argument is copied, not updated, so a chunk rolled back and retried
+    after a lock timeout never sees ids from the failed attempt.
+    """
+    user_ids = dict(user_ids)
+    if table == "users":
+        params = [{"name": _user_name(row)} for row in chunk]
+        params = [p for p in params if p["name"]]
+        if params:
+            connection.execute(
+                text("INSERT OR IGNORE INTO users (name) VALUES (:name)"),
+                params,
+            )
+    else:
+        params = [_movie_params(connection, row, user_ids) for row in chunk]
+        connection.execute(text(_UPSERT_MOVIE_SQL), params)
+    return user_ids
+
+
+def import_table(src, table, fmt="ndjson", progress=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Import rows of `table` from the text file object `src`.
+
+    Users are inserted by name (existing names are kept). Movies are
+    upserted on (user_id, title). Each chunk of `chunk_size` rows is
+    committed in its own transaction; `progress(stats)` runs after each.
+    Returns a TransferStats.
+    """
+    _check(table, fmt)
+    stats = TransferStats()
+    user_ids = {}
+
+    for chunk in _chunks(_read_rows(src, fmt), chunk_size):
+        try:
+            user_ids = movie_storage_sql.run_write(
+                lambda connection, c=chunk, ids=user_ids: _import_chunk(
+                    connection, table, c, ids
+                )
+            )
+        except IntegrityError as exc:
+            raise TransferError(
+                f"Chunk after row {stats.rows} rejected: {exc.orig}"
+            ) from exc
+
+        stats.tick(len(chunk))
+        if progress:
+            progress(stats)
+
+    stats.tick(0)
+    return stats
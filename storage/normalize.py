@@ -0,0 +1,17 @@
+"""Normalized title keys used for case/accent-insensitive lookups."""
+
+import unicodedata
+
+
+def normalize_title(title):
+    """
+    Return the lookup key for a title.
+
+    Casefolded, accents stripped and whitespace collapsed:
+    "  Amélie   POULAIN " -> "amelie poulain"
+    """
+    decomposed = unicodedata.normalize("NFKD", title or "")
+    stripped = "".join(
+        ch for ch in decomposed if not unicodedata.combining(ch)
+    )
+    return " ".join(stripped.casefold().split())
@@ -0,0 +1,166 @@
+"""
+Concurrent writer stress test for the SQLite storage backend.
+
+Starts several writer processes against one database file. Each adds,
+updates and deletes its own movies and also adds one title shared by all
+writers, so the trigger-maintained title_stats counter is updated by
+every process. Afterwards the database is checked for lost or stray
+writes (rows, summaries and change-log versions), and throughput plus
+lock retries are reported.
+
+Run:
+    python3 stress_test.py
+    python3 stress_test.py --writers 16 --movies 200 --db /tmp/stress.db
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from storage import movie_storage_sql as sql
+
+SHARED_TITLE = "Shared Movie"
+
+
+def writer_titles(writer, movies):
+    """Titles a writer adds."""
+    return [f"w{writer}-movie-{i}" for i in range(movies)]
+
+
+def final_rating(writer, index):
+    """Rating a writer's movie must end up with after its update."""
+    return float((writer + index) % 10 + 1)
+
+
+def writer(args):
+    """
+    Run one writer process; returns (operations, lock retries).
+
+    Every title is added and updated; every 5th one is deleted again.
+    """
+    db_path, number, movies = args
+    sql.configure(db_path=db_path)
+    user_id = sql.create_user(f"stress_w{number}")
+    ops = 1
+
+    sql.add_movie(user_id, SHARED_TITLE, 2000, 5.0, "", "", "Shared")
+    ops += 1
+
+    for i, title in enumerate(writer_titles(number, movies)):
+        sql.add_movie(user_id, title, 2000 + i % 20, 1.0, "", "", "Stress")
+        sql.update_movie(user_id, title, rating=final_rating(number, i),
+                         note=f"note {i}")
+        ops += 2
+        if i % 5 == 4:
+            sql.delete_movie(user_id, title)
+            ops += 1
+
+    return ops, sql.lock_retries
+
+
+def verify(db_path, writers, movies):
+    """Return a list of problems found in the database (empty if none)."""
+    sql.configure(db_path=db_path)
+    problems = []
+
+    for number in range(writers):
+        user_id = sql.get_user_id(f"stress_w{number}")
+        if user_id is None:
+            problems.append(f"user stress_w{number} missing")
+            continue
+        stored = sql.list_movies(user_id)
+        expected = {SHARED_TITLE: (5.0, "")}
+        for i, title in enumerate(writer_titles(number, movies)):
+            if i % 5 != 4:
+                expected[title] = (final_rating(number, i), f"note {i}")
+
+        for title, (rating, note) in expected.items():
+            data = stored.get(title)
+            if data is None:
+                problems.append(f"stress_w{number}: '{title}' lost")
+            elif (data["rating"], data["note"]) != (rating, note):
+                problems.append(
+                    f"stress_w{number}: '{title}' has "
+                    f"{data['rating']}/{data['note']!r}, "
+                    f"expected {rating}/{note!r}"
+                )
+        for title in stored.keys() - expected.keys():
+            problems.append(f"stress_w{number}: '{title}' not deleted")
+
+        # One logged change per add, update and delete.
+        changes = 1 + 2 * movies + movies // 5
+        version = sql.collection_version(user_id)
+        if version != changes:
+            problems.append(f"stress_w{number}: collection version "
+                            f"{version}, expected {changes}")
+
+    with sql.get_engine().connect() as connection:
+        adds = connection.execute(
+            text("SELECT adds FROM title_stats WHERE title = :t"),
+            {"t": SHARED_TITLE},
+        ).scalar()
+    if adds != writers:
+        problems.append(f"title_stats counts {adds} adds of "
+                        f"'{SHARED_TITLE}', expected {writers}")
+    return problems
+
+
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--writers", type=int, default=8,
+                        help="number of writer processes (default: 8)")
+    parser.add_argument("--movies", type=int, default=100,
+                        help="movies added per writer (default: 100)")
+    parser.add_argument("--db", help="database file (default: a temp file)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run the stress test; returns a process exit code."""
+    args = parse_args(argv)
+    workdir = None
+    db_path = args.db
+    if db_path is None:
+        workdir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(workdir.name, "stress.db")
+    elif os.path.exists(db_path):
+        os.remove(db_path)
+
+    # Create the schema once up front; writers then only contend on data.
+    sql.configure(db_path=db_path)
+    sql.engine.dispose()
+
+    jobs = [(db_path, n, args.movies) for n in range(args.writers)]
+    ctx = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+    with ctx.Pool(args.writers) as pool:
+        results = pool.map(writer, jobs)
+    elapsed = time.perf_counter() - start
+
+    ops = sum(r[0] for r in results)
+    retries = sum(r[1] for r in results)
+    print(f"{args.writers} writers, {ops} write transactions "
+          f"in {elapsed:.2f} s ({ops / elapsed:.0f} tx/s), "
+          f"{retries} lock retries")
+
+    problems = verify(db_path, args.writers, args.movies)
+    sql.engine.dispose()
+    if workdir is not None:
+        workdir.cleanup()
+
+    if problems:
+        for problem in problems[:20]:
+            print(f"FAIL: {problem}")
+        print(f"{len(problems)} problem(s) found.")
+        return 1
+    print("OK: no lost or stray writes.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,104 @@
+"""
+Export/import the users and movies tables as NDJSON or CSV.
+
+Run:
+    python3 transfer.py export movies -o movies.ndjson
+    python3 transfer.py export users -o users.csv
+    python3 transfer.py import movies movies.ndjson
+
+The format is taken from the file extension unless --format is given.
+Use "-" for stdout/stdin.
+"""
+
+import argparse
+import os
+import sys
+
+from storage import movie_transfer
+from storage.errors import DatabaseBusyError
+
+
+def _guess_format(path, explicit):
+    """Return the explicit format, else infer it from the file extension."""
+    if explicit:
+        return explicit
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    return "csv" if ext == "csv" else "ndjson"
+
+
+def _report(stats):
+    """Print running throughput to stderr."""
+    print(f"  ... {stats}", file=sys.stderr)
+
+
+def _open(path, mode):
+    """Open a text file, or return stdin/stdout for '-'."""
+    if path == "-":
+        return sys.stdout if "w" in mode else sys.stdin
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def main(argv=None):
+    """Parse arguments and run the export or import."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    exp = sub.add_parser("export", help="stream a table to a file")
+    exp.add_argument("table", choices=movie_transfer.TABLES)
+    exp.add_argument("-o", "--output", default="-")
+
+    imp = sub.add_parser("import", help="upsert rows from a file")
+    imp.add_argument("table", choices=movie_transfer.TABLES)
+    imp.add_argument("input")
+
+    for cmd in (exp, imp):
+        cmd.add_argument("--format", choices=movie_transfer.FORMATS)
+        cmd.add_argument(
+            "--chunk-size",
+            type=int,
+            default=movie_transfer.DEFAULT_CHUNK_SIZE,
+        )
+        cmd.add_argument("--quiet", action="store_true")
+
+    args = parser.parse_args(argv)
+    progress = None if args.quiet else _report
+
+    if args.command == "export":
+        fmt = _guess_format(args.output, args.format)
+        try:
+            out = _open(args.output, "w")
+        except OSError as exc:
+            print(f"Export failed: {exc}", file=sys.stderr)
+            return 1
+        try:
+            stats = movie_transfer.export_table(
+                out, args.table, fmt, progress, args.chunk_size
+            )
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        print(f"Exported {args.table}: {stats}", file=sys.stderr)
+    else:
+        fmt = _guess_format(args.input, args.format)
+        try:
+            src = _open(args.input, "r")
+        except OSError as exc:
+            print(f"Import failed: {exc}", file=sys.stderr)
+            return 1
+        try:
+            stats = movie_transfer.import_table(
+                src, args.table, fmt, progress, args.chunk_size
+            )
+        except (movie_transfer.TransferError, DatabaseBusyError) as exc:
+            print(f"Import failed: {exc}", file=sys.stderr)
+            return 1
+        finally:
+            if src is not sys.stdin:
+                src.close()
+        print(f"Imported {args.table}: {stats}", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())